@@ -1,66 +1,23 @@
 import "maplibre-gl/dist/maplibre-gl.css";
 import { useEffect, useRef, useState } from "react";
 import { Layer, Map, Source } from "react-map-gl/maplibre";
+import { fetchChoropleth } from "./api/server";
+import { topologyToGeoJSON } from "./topojson";
 
-const fipsToState = {
-	"01": "Alabama",
-	"02": "Alaska",
-	"04": "Arizona",
-	"05": "Arkansas",
-	"06": "California",
-	"08": "Colorado",
-	"09": "Connecticut",
-	10: "Delaware",
-	11: "District of Columbia",
-	12: "Florida",
-	13: "Georgia",
-	15: "Hawaii",
-	16: "Idaho",
-	17: "Illinois",
-	18: "Indiana",
-	19: "Iowa",
-	20: "Kansas",
-	21: "Kentucky",
-	22: "Louisiana",
-	23: "Maine",
-	24: "Maryland",
-	25: "Massachusetts",
-	26: "Michigan",
-	27: "Minnesota",
-	28: "Mississippi",
-	29: "Missouri",
-	30: "Montana",
-	31: "Nebraska",
-	32: "Nevada",
-	33: "New Hampshire",
-	34: "New Jersey",
-	35: "New Mexico",
-	36: "New York",
-	37: "North Carolina",
-	38: "North Dakota",
-	39: "Ohio",
-	40: "Oklahoma",
-	41: "Oregon",
-	42: "Pennsylvania",
-	44: "Rhode Island",
-	45: "South Carolina",
-	46: "South Dakota",
-	47: "Tennessee",
-	48: "Texas",
-	49: "Utah",
-	50: "Vermont",
-	51: "Virginia",
-	53: "Washington",
-	54: "West Virginia",
-	55: "Wisconsin",
-	56: "Wyoming",
-	60: "American Samoa",
-	66: "Guam",
-	69: "Northern Mariana Islands",
-	72: "Puerto Rico",
-	78: "U.S. Virgin Islands",
+// Must match ZOOM_LEVELS in server/choropleth.py so requests hit cached payloads
+const zoomLevels = [3, 4, 5, 7];
+
+const snapZoom = zoom => {
+	const levels = zoomLevels.filter(level => level <= zoom);
+	return levels.length ? levels[levels.length - 1] : zoomLevels[0];
 };
 
+// Map feature properties flatten nested arrays into JSON strings
+const getSenators = properties =>
+	typeof properties.senators === "string"
+		? JSON.parse(properties.senators)
+		: properties.senators ?? [];
+
 const stateOutlineLayer = {
 	id: "state-outline",
 	type: "line",
@@ -167,39 +124,27 @@ export default function InteractiveMap({
 	const [geojson, setGeojson] = useState(null);
 	const [statesGeo, setStatesGeo] = useState(null);
 
+	const [zoomLevel, setZoomLevel] = useState(zoomLevels[0]);
+
 	useEffect(() => {
 		(async () => {
-			const geojson_path = "/data/us_state.geojson";
-
-			const response = await fetch(geojson_path);
-			const states_gj = await response.json();
-			setStatesGeo(states_gj);
+			const topology = await fetchChoropleth("senate", zoomLevel);
+			setStatesGeo(topologyToGeoJSON(topology, "states"));
 		})();
-	}, []);
+	}, [zoomLevel]);
 
-	// Load and augment GeoJSON
+	// Load the simplified districts with the members already joined by the server,
+	// the Senate view reuses the state geometry loaded above
 	useEffect(() => {
-		(async () => {
-			const geojson_path =
-				congress === "House of Representatives"
-					? "/data/us_cd_119.geojson"
-					: "/data/us_state.geojson";
-
-			const response = await fetch(geojson_path);
-			const gj = await response.json();
-
-			// Add a bucket to each feature for random colors
-			for (const f of gj.features) {
-				const geoid = Number(String(f.properties?.GEOID ?? f.id));
-				const bucket = Number.isFinite(geoid)
-					? geoid % 14
-					: Math.floor(Math.random() * 14);
-				f.properties = { ...f.properties, bucket };
-			}
+		if (congress !== "House of Representatives") return;
 
-			setGeojson(gj);
+		(async () => {
+			const topology = await fetchChoropleth("house", zoomLevel);
+			setGeojson(topologyToGeoJSON(topology, "districts"));
 		})();
-	}, [congress]);
+	}, [congress, zoomLevel]);
+
+	const mapData = congress === "House of Representatives" ? geojson : statesGeo;
 
 	useEffect(() => {
 		const map = mapRef.current?.getMap?.();
@@ -222,22 +167,13 @@ export default function InteractiveMap({
 			return;
 		}
 
-		const state = fipsToState[f.properties.STATEFP];
+		const state = f.properties.state;
 
 		if (congress === "House of Representatives") {
 			const district = f.properties.NAMELSAD.replace(
 				"Congressional District",
 				""
 			);
-			let rep = "";
-			if (district === " (at Large)") {
-				rep = houseMembers.find(member => member.state === state);
-			} else {
-				rep = houseMembers.find(
-					member =>
-						member.district === parseInt(district) && member.state === state
-				);
-			}
 
 			// x, y, are relative to the map container
 			setHoverInfo({
@@ -245,12 +181,10 @@ export default function InteractiveMap({
 				y: e.point.y,
 				state,
 				district,
-				rep: rep ? rep.name : "Not found",
+				rep: f.properties.name ? f.properties.name : "Not found",
 			});
 		} else {
-			const senators = senateMembers
-				.filter(member => member.state === state)
-				.map(senator => senator.name);
+			const senators = getSenators(f.properties).map(senator => senator.name);
 
 			// x, y, are relative to the map container
 			setHoverInfo({
@@ -269,33 +203,26 @@ export default function InteractiveMap({
 			return;
 		}
 
-		const state = fipsToState[f.properties.STATEFP];
-
 		if (congress === "House of Representatives") {
-			const district = f.properties.NAMELSAD.replace(
-				"Congressional District",
-				""
-			);
-
-			let rep = "";
-			if (district === " (at Large)") {
-				rep = houseMembers.find(member => member.state === state);
-			} else {
-				rep = houseMembers.find(
-					member =>
-						member.district === parseInt(district) && member.state === state
-				);
-			}
+			const rep = houseMembers.find(member => member.name === f.properties.name);
 
 			setCongressperson(rep);
 		} else {
-			const senators = senateMembers.filter(member => member.state === state);
+			const names = getSenators(f.properties).map(senator => senator.name);
+			const senators = senateMembers.filter(member =>
+				names.includes(member.name)
+			);
 
 			setPossibleSenators(senators);
 			setIsChooseSenatorModalOpen(true);
 		}
 	};
 
+	const onZoomEnd = e => {
+		const level = snapZoom(e.viewState.zoom);
+		if (level !== zoomLevel) setZoomLevel(level);
+	};
+
 	return (
 		<div
 			style={{ width: "100%", height: "100%" }}
@@ -309,8 +236,9 @@ export default function InteractiveMap({
 				interactiveLayerIds={["data"]}
 				onMouseMove={onHover}
 				onMouseLeave={() => setHoverInfo(null)}
-				onClick={onChoose}>
-				<Source type="geojson" data={geojson} promoteId="GEOID">
+				onClick={onChoose}
+				onZoomEnd={onZoomEnd}>
+				<Source type="geojson" data={mapData} promoteId="GEOID">
 					<Layer {...dataLayer} />
 					<Layer {...lineLayer} />
 					{congress === "House of Representatives" ? (
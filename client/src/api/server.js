@@ -19,3 +19,11 @@ export const fetchMemberFeedback = async (name, limit = 10) => {
 	});
 	return data; // ReportResponse
 };
+
+// GET /choropleth?congress=house|senate&zoom=...
+export const fetchChoropleth = async (congress, zoom = 3) => {
+	const { data } = await api.get("/choropleth", {
+		params: { congress, zoom },
+	});
+	return data; // TopoJSON Topology
+};
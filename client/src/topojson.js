@@ -0,0 +1,42 @@
+// Minimal TopoJSON decoder for the quantized, delta-encoded topologies served by /choropleth
+export const topologyToGeoJSON = (topology, objectName) => {
+	const [sx, sy] = topology.transform.scale;
+	const [tx, ty] = topology.transform.translate;
+
+	// Decode each arc once, shared borders are reused by both neighbours
+	const arcs = topology.arcs.map(arc => {
+		let x = 0;
+		let y = 0;
+		return arc.map(([dx, dy]) => {
+			x += dx;
+			y += dy;
+			return [x * sx + tx, y * sy + ty];
+		});
+	});
+
+	const ring = arcIndexes => {
+		const points = [];
+		for (const i of arcIndexes) {
+			const arc = i >= 0 ? arcs[i] : arcs[~i].slice().reverse();
+			points.push(...(points.length ? arc.slice(1) : arc));
+		}
+		return points;
+	};
+
+	const polygon = rings => rings.map(ring);
+
+	return {
+		type: "FeatureCollection",
+		features: topology.objects[objectName].geometries.map(geometry => ({
+			type: "Feature",
+			properties: geometry.properties,
+			geometry: {
+				type: geometry.type,
+				coordinates:
+					geometry.type === "Polygon"
+						? polygon(geometry.arcs)
+						: geometry.arcs.map(polygon),
+			},
+		})),
+	};
+};
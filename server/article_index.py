@@ -0,0 +1,425 @@
+import hashlib
+import re
+import threading
+import urllib.parse
+from collections import Counter, OrderedDict
+import numpy as np
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "cmpid",
+    "ocid",
+    "smid",
+    "smtyp",
+    "taid",
+    "sr_share",
+    "ref",
+    "ref_src",
+    "referrer",
+    "guccounter",
+    "guce_referrer",
+    "guce_referrer_sig",
+    "outputtype",
+    "amp",
+}
+
+TRACKING_PREFIXES = ("utm_", "at_", "icid", "__twitter")
+
+SIMHASH_BITS = 64
+
+# Shorter titles ("Opinion", "Live updates") are too generic to match on
+MIN_TITLE_WORDS = 5
+
+
+def canonicalize_url(url: str):
+    # Strip tracking parameters and map AMP variants to the canonical article URL
+    parts = urllib.parse.urlsplit(url.strip())
+
+    host = parts.netloc.lower()
+    host = host.removeprefix("www.").removeprefix("amp.")
+
+    path = parts.path
+
+    # e.g. example-com.cdn.ampproject.org/c/s/example.com/story -> example.com/story
+    if host.endswith(".cdn.ampproject.org"):
+        match = re.match(r"^/[cvi]/(?:s/)?([^/]+)(/.*)?$", path)
+        if match:
+            host = match.group(1).lower().removeprefix("www.")
+            path = match.group(2) or "/"
+
+    path = re.sub(r"/amp(/|\.html)?$", "", path)
+    path = re.sub(r"\.amp(\.html)?$", "", path)
+    path = re.sub(r"/amp/", "/", path)
+    path = path.rstrip("/") or "/"
+
+    query = [
+        (key, value)
+        for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+
+    return urllib.parse.urlunsplit(
+        ("https", host, path, urllib.parse.urlencode(sorted(query)), "")
+    )
+
+
+def get_host(url: str):
+    return urllib.parse.urlsplit(canonicalize_url(url)).netloc
+
+
+def is_same_host(host: str, other: str):
+    return host == other or host.endswith("." + other) or other.endswith("." + host)
+
+
+def normalize_title(title: str):
+    # Drop the " - Outlet" / " | Outlet" suffix that syndicated copies add
+    title = re.split(r"\s+[-|–—]\s+(?=[^-|–—]+$)", title.strip())[0]
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+
+def simhash(text: str, shingle_size: int = 3):
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+
+    shingles = {
+        " ".join(words[i : i + shingle_size])
+        for i in range(max(1, len(words) - shingle_size + 1))
+    }
+
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+            for s in shingles
+        ],
+        dtype=np.uint64,
+    )
+
+    # shape: (N, 64) bits of every shingle hash, most significant bit first
+    bits = np.unpackbits(hashes.byteswap().view(np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+
+    fingerprint = 0
+    for bit in votes > 0:
+        fingerprint = (fingerprint << 1) | int(bit)
+
+    return fingerprint
+
+
+class SimHashIndex:
+    # Splits each fingerprint into max_distance + 1 bands. Two fingerprints
+    # within max_distance bits must agree exactly on at least one band, so a
+    # lookup only compares against the bucket of each band, not the corpus.
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+        self.bands = [{} for _ in range(self.num_bands)]
+
+    def get_bands(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        return [
+            (fingerprint >> (i * self.band_bits)) & mask for i in range(self.num_bands)
+        ]
+
+    def add(self, fingerprint: int, key):
+        for band, value in zip(self.bands, self.get_bands(fingerprint)):
+            band.setdefault(value, []).append((fingerprint, key))
+
+    def remove(self, fingerprint: int, key):
+        for band, value in zip(self.bands, self.get_bands(fingerprint)):
+            bucket = band.get(value, [])
+            if (fingerprint, key) in bucket:
+                bucket.remove((fingerprint, key))
+            if not bucket:
+                band.pop(value, None)
+
+    def query(self, fingerprint: int):
+        best_key = None
+        best_distance = self.max_distance + 1
+
+        for band, value in zip(self.bands, self.get_bands(fingerprint)):
+            for candidate, key in band.get(value, []):
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best_key = key
+                    best_distance = distance
+
+        return best_key
+
+
+class ArticleIndex:
+    # Shared across members so syndicated copies (AP, Reuters, ...) found in
+    # one member's feed reuse the scrape and embedding results of another.
+
+    def __init__(
+        self,
+        max_articles: int = 20000,
+        max_embeddings: int = 2000,
+        shared_cache=None,
+    ):
+        # With a host-level shared cache the scraped texts and vectors only
+        # live there, and each worker keeps just the keys, groups and
+        # fingerprints of its working set. Otherwise up to max_articles texts
+        # and max_embeddings float32 vectors (~12 KB each for
+        # text-embedding-3-large) are kept in memory.
+        self.shared_cache = shared_cache
+        self.max_articles = max_articles
+        self.max_embeddings = max_embeddings
+        self.lock = threading.Lock()
+
+        # canonical url -> {"url", "title", "text", "group"}, or just
+        # {"group"} if shared
+        self.articles = OrderedDict()
+        self.titles = {}  # normalized title -> canonical url, if not shared
+        self.text_index = SimHashIndex()
+        self.text_fingerprints = {}  # canonical url -> simhash
+
+        # (model, sha1 of text) -> (simhash, float32 vector or None if shared)
+        self.embeddings = OrderedDict()
+        self.embedding_index = SimHashIndex()
+
+        self.stats = Counter()
+
+    def find_article(self, canonical_url: str):
+        with self.lock:
+            article = self.articles.get(canonical_url)
+            if article is not None:
+                self.articles.move_to_end(canonical_url)
+
+        if self.shared_cache is not None:
+            article = self.shared_cache.get_article(canonical_url)
+
+        return article
+
+    def find_article_by_title(self, title: str):
+        if self.shared_cache is not None:
+            return self.shared_cache.get_article_by_title(title)
+
+        with self.lock:
+            article = self.articles.get(self.titles.get(title))
+
+        return article
+
+    def get_article(self, url: str):
+        article = self.find_article(canonicalize_url(url))
+
+        with self.lock:
+            self.stats["article_lookups"] += 1
+            if article is not None:
+                self.stats["url_hits"] += 1
+
+        return dict(article) if article is not None else None
+
+    def get_article_by_title(self, title: str, source_url: str):
+        # Matches an RSS entry to a syndicated copy of the same story scraped
+        # from another outlet, before anything is fetched. Only long titles
+        # are trusted, and never against the entry's own outlet, whose
+        # generic headlines would otherwise swap in an unrelated article.
+        title = normalize_title(title)
+        source_host = get_host(source_url) if source_url else ""
+
+        with self.lock:
+            self.stats["rss_title_lookups"] += 1
+
+        if len(title.split()) < MIN_TITLE_WORDS or not source_host:
+            return None
+
+        article = self.find_article_by_title(title)
+        if article is None or is_same_host(get_host(article["url"]), source_host):
+            return None
+
+        with self.lock:
+            self.stats["rss_title_hits"] += 1
+
+        return dict(article)
+
+    def add_article(self, article: dict):
+        # Indexes a freshly scraped article and returns the canonical url of
+        # the group of syndicated copies it belongs to
+        canonical_url = canonicalize_url(article["url"])
+        title = normalize_title(article.get("title", ""))
+        fingerprint = simhash(article.get("text", ""))
+
+        with self.lock:
+            self.stats["scraped"] += 1
+
+            if canonical_url in self.articles:
+                return self.articles[canonical_url]["group"]
+
+            group = canonical_url
+            if fingerprint is not None:
+                match = self.text_index.query(fingerprint)
+                if match is not None:
+                    self.stats["text_hits"] += 1
+                    group = self.articles[match]["group"]
+
+        if fingerprint is None and title:
+            # Fall back on the title when no text could be extracted
+            match = self.find_article_by_title(title)
+            if match is not None:
+                with self.lock:
+                    self.stats["title_hits"] += 1
+                group = match["group"]
+
+        article = {
+            "url": article["url"],
+            "title": article.get("title", ""),
+            "text": article.get("text", ""),
+            "group": group,
+        }
+
+        if self.shared_cache is not None:
+            self.shared_cache.set_article(canonical_url, title, article)
+
+        with self.lock:
+            if canonical_url in self.articles:
+                return self.articles[canonical_url]["group"]
+
+            if self.shared_cache is None:
+                self.articles[canonical_url] = article
+                if title:
+                    self.titles.setdefault(title, canonical_url)
+            else:
+                self.articles[canonical_url] = {"group": group}
+
+            if fingerprint is not None:
+                self.text_fingerprints[canonical_url] = fingerprint
+                self.text_index.add(fingerprint, canonical_url)
+
+            while len(self.articles) > self.max_articles:
+                old_url, old_article = self.articles.popitem(last=False)
+                old_fingerprint = self.text_fingerprints.pop(old_url, None)
+
+                if old_fingerprint is not None:
+                    self.text_index.remove(old_fingerprint, old_url)
+
+                old_title = normalize_title(old_article.get("title", ""))
+                if self.titles.get(old_title) == old_url:
+                    del self.titles[old_title]
+
+            return group
+
+    def get_embedding(self, text: str, model: str):
+        vector, source = self.find_embedding(text, model)
+
+        with self.lock:
+            self.stats["embedding_lookups"] += 1
+            if vector is not None:
+                self.stats["embedding_hits"] += 1
+            if source == "shared":
+                self.stats["shared_embedding_hits"] += 1
+
+        return vector
+
+    def find_embedding(self, text: str, model: str):
+        # Returns (vector, source) without touching the stats, so offline jobs
+        # can check the cache without skewing the hit rates
+        key = (model, hashlib.sha1(text.encode()).hexdigest())
+
+        with self.lock:
+            cached = self.embeddings.get(key)
+            if cached is not None:
+                self.embeddings.move_to_end(key)
+
+        vector = self.load_vector(key, cached)
+        if vector is not None:
+            return vector, "memory"
+
+        fingerprint = simhash(text)
+
+        if self.shared_cache is not None:
+            vector = self.shared_cache.get_embedding(*key)
+            if vector is not None:
+                self.add_embedding(text, model, vector, fingerprint, persist=False)
+                return vector, "shared"
+
+        if fingerprint is None:
+            return None, None
+
+        with self.lock:
+            # Near-duplicate texts, e.g. the same wire story with another
+            # member's name removed, share an embedding
+            near_key = self.embedding_index.query(fingerprint)
+            cached = None
+            if near_key is not None and near_key[0] == model:
+                cached = self.embeddings.get(near_key)
+
+        vector = self.load_vector(near_key, cached)
+        return vector, "near" if vector is not None else None
+
+    def load_vector(self, key, cached):
+        if cached is None:
+            return None
+
+        _, vector = cached
+        if vector is None and self.shared_cache is not None:
+            vector = self.shared_cache.get_embedding(*key)
+
+        return vector
+
+    def add_embedding(
+        self, text: str, model: str, vector, fingerprint=None, persist: bool = True
+    ):
+        key = (model, hashlib.sha1(text.encode()).hexdigest())
+        vector = np.asarray(vector, dtype=np.float32)
+        if fingerprint is None:
+            fingerprint = simhash(text)
+
+        if persist and self.shared_cache is not None:
+            self.shared_cache.set_embedding(*key, vector)
+
+        with self.lock:
+            if key in self.embeddings:
+                return
+
+            self.embeddings[key] = (
+                fingerprint,
+                vector if self.shared_cache is None else None,
+            )
+            if fingerprint is not None:
+                self.embedding_index.add(fingerprint, key)
+
+            while len(self.embeddings) > self.max_embeddings:
+                old_key, (old_fingerprint, _) = self.embeddings.popitem(last=False)
+                if old_fingerprint is not None:
+                    self.embedding_index.remove(old_fingerprint, old_key)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            num_articles = len(self.articles)
+            num_embeddings = len(self.embeddings)
+
+        article_lookups = stats.get("article_lookups", 0)
+        rss_title_lookups = stats.get("rss_title_lookups", 0)
+        embedding_lookups = stats.get("embedding_lookups", 0)
+        scraped = stats.get("scraped", 0)
+
+        return {
+            "articles": num_articles,
+            "embeddings": num_embeddings,
+            **stats,
+            "url_hit_rate": stats.get("url_hits", 0) / article_lookups
+            if article_lookups
+            else 0.0,
+            "rss_title_hit_rate": stats.get("rss_title_hits", 0) / rss_title_lookups
+            if rss_title_lookups
+            else 0.0,
+            "duplicate_rate": (stats.get("text_hits", 0) + stats.get("title_hits", 0))
+            / scraped
+            if scraped
+            else 0.0,
+            "embedding_hit_rate": stats.get("embedding_hits", 0) / embedding_lookups
+            if embedding_lookups
+            else 0.0,
+        }
@@ -0,0 +1,199 @@
+# uvicorn batch_stand_in:app --port 8001
+# Local stand-in for the OpenAI Files and Batches APIs so bulk_refresh.py can
+# run without network access or cost:
+# OPENAI_BASE_URL=http://localhost:8001/v1 python bulk_refresh.py --poll-seconds 1
+# The synchronous endpoints also serve the reports of benchmark_workers.py.
+
+import email
+import hashlib
+import json
+import time
+import uuid
+from fastapi import FastAPI, HTTPException, Request, Response
+from rep_feedback import OpenAIResponse
+
+
+EMBEDDING_DIMENSIONS = 64
+
+app = FastAPI()
+files = {}  # file id -> (filename, bytes)
+batches = {}  # batch id -> batch object
+
+
+def fake_embedding(text: str):
+    # Deterministic unit vector so identical texts embed identically
+    digest = hashlib.sha256(text.encode()).digest() * (EMBEDDING_DIMENSIONS // 32)
+    vector = [b / 255 - 0.5 for b in digest[:EMBEDDING_DIMENSIONS]]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+
+    return [v / norm for v in vector]
+
+
+def fake_response(body):
+    text = json.dumps(
+        OpenAIResponse(
+            summary="**Stand-in** summary.",
+            positives="- **Stand-in** positive",
+            negatives="- **Stand-in** negative",
+            improvements="- **Stand-in** improvement",
+            pulseSentiment=len(json.dumps(body["input"])) % 101,
+        ).model_dump()
+    )
+
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "status": "completed",
+        "model": body["model"],
+        "output": [
+            {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text}],
+            }
+        ],
+    }
+
+
+def fake_embeddings_body(body):
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+
+    return {
+        "object": "list",
+        "model": body["model"],
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(t)}
+            for i, t in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+def run_batch(batch):
+    _, content = files[batch["input_file_id"]]
+
+    lines = []
+    for line in content.decode().splitlines():
+        if not line.strip():
+            continue
+
+        request = json.loads(line)
+        body = request["body"]
+
+        if request["url"] == "/v1/embeddings":
+            response_body = fake_embeddings_body(body)
+            # Out of order, so clients have to match on the index
+            response_body["data"].reverse()
+        else:
+            response_body = fake_response(body)
+
+        lines.append(
+            json.dumps(
+                {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": response_body},
+                    "error": None,
+                }
+            )
+        )
+
+    output_file_id = f"file-{uuid.uuid4().hex}"
+    files[output_file_id] = ("output.jsonl", ("\n".join(lines) + "\n").encode())
+
+    batch.update(
+        status="completed",
+        output_file_id=output_file_id,
+        completed_at=int(time.time()),
+        request_counts={"total": len(lines), "completed": len(lines), "failed": 0},
+    )
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    # Synchronous embeddings, used when a batch did not cover every text
+    return fake_embeddings_body(await request.json())
+
+
+@app.post("/v1/responses")
+async def create_response(request: Request):
+    # Synchronous reports, as /member_feedback makes them
+    return fake_response(await request.json())
+
+
+@app.post("/v1/files")
+async def create_file(request: Request):
+    # Parse the multipart upload with the standard library
+    raw = await request.body()
+    message = email.message_from_bytes(
+        b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + raw
+    )
+
+    fields = {}
+    filename = "upload.jsonl"
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = part.get_payload(decode=True)
+        if name == "file":
+            filename = part.get_filename() or filename
+
+    file_id = f"file-{uuid.uuid4().hex}"
+    files[file_id] = (filename, fields["file"])
+
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(fields["file"]),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": fields.get("purpose", b"batch").decode(),
+        "status": "processed",
+    }
+
+
+@app.get("/v1/files/{file_id}/content")
+def get_file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail=f"No file {file_id}")
+
+    return Response(content=files[file_id][1], media_type="application/jsonl")
+
+
+@app.post("/v1/batches")
+async def create_batch(request: Request):
+    params = await request.json()
+
+    if params["input_file_id"] not in files:
+        raise HTTPException(status_code=404, detail="Input file not found")
+
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": params["endpoint"],
+        "input_file_id": params["input_file_id"],
+        "completion_window": params["completion_window"],
+        "status": "in_progress",
+        "created_at": int(time.time()),
+        "output_file_id": None,
+        "error_file_id": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+    }
+
+    return batches[batch_id]
+
+
+@app.get("/v1/batches/{batch_id}")
+def get_batch(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail=f"No batch {batch_id}")
+
+    batch = batches[batch_id]
+
+    # Complete on the first poll so clients exercise their polling loop
+    if batch["status"] == "in_progress":
+        batch["status"] = "finalizing"
+    elif batch["status"] == "finalizing":
+        run_batch(batch)
+
+    return batch
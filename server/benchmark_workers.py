@@ -0,0 +1,344 @@
+# python benchmark_workers.py --workers 1 2 4 8
+# Starts `uvicorn main:app --workers N` against a fresh shared state directory
+# and reports the time until every worker finished its startup, then serves
+# every choropleth payload and a report for --members members, and reports
+# the PSS and RSS of the whole process tree.
+# PSS splits shared pages between the processes mapping them, so unlike
+# summed RSS it does not count the same page once per worker.
+# The reports scrape a local article server instead of Google News, with
+# overlapping articles between members, and call batch_stand_in.py instead
+# of OpenAI. Article fetches above the number of distinct articles are
+# scrapes repeated by another worker.
+# Without --live the roster snapshot is seeded from a stand-in so no
+# Congress.gov key is needed. --server-dir runs another checkout of server/.
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+NUM_ARTICLES = 60
+ARTICLES_PER_MEMBER = 15
+
+
+def fake_get_congress_members():
+    from congress_members import Congressperson
+
+    house_rep_members = [
+        Congressperson(
+            name=f"Representative {i}",
+            partyName="Democratic" if i % 2 else "Republican",
+            state=f"State {i % 50}",
+            district=i % 53 + 1,
+            imageUrl=f"https://www.congress.gov/img/member/{i}.jpg",
+        )
+        for i in range(435)
+    ]
+    senate_members = [
+        Congressperson(
+            name=f"Senator {i}",
+            partyName="Democratic" if i % 2 else "Republican",
+            state=f"State {i % 50}",
+            imageUrl=f"https://www.congress.gov/img/member/s{i}.jpg",
+        )
+        for i in range(100)
+    ]
+
+    return house_rep_members, senate_members
+
+
+def get_member_article_ids(member: int):
+    # Neighbouring members share two thirds of their articles
+    return [(member * 5 + i) % NUM_ARTICLES for i in range(ARTICLES_PER_MEMBER)]
+
+
+def get_article_title(article_id: int):
+    return f"Congress debates the funding bill in story {article_id}"
+
+
+def get_article_html(article_id: int):
+    rng = random.Random(article_id)
+    paragraphs = "".join(
+        "<p>" + " ".join(f"word{rng.randrange(5000)}" for _ in range(60)) + "</p>"
+        for _ in range(40)
+    )
+
+    return (
+        f"<html><head><title>{get_article_title(article_id)}</title></head>"
+        f"<body><article>{paragraphs}</article></body></html>"
+    ).encode()
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    fetches = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with ArticleHandler.lock:
+            ArticleHandler.fetches += 1
+
+        body = get_article_html(int(self.path.rsplit("/", 1)[-1]))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_app():
+    # main:app with Google News replaced by the local article server, run
+    # with `uvicorn --factory benchmark_workers:create_app`
+    import feedparser
+    import main
+
+    articles_url = os.environ["BENCHMARK_ARTICLES_URL"]
+
+    def get_google_news_articles_rss(keyword: str, limit: int = 25):
+        # The fake roster names end with the member number
+        return [
+            feedparser.FeedParserDict(
+                title=get_article_title(article_id) + " - Wire",
+                link=f"{articles_url}/article/{article_id}",
+                # Another outlet, so syndicated titles are matched
+                source={"href": "https://wire.example.com"},
+            )
+            for article_id in get_member_article_ids(int(keyword.split()[-1]))
+        ][:limit]
+
+    main.get_google_news_articles_rss = get_google_news_articles_rss
+    main.get_google_rss_redirect_links = lambda links, shared_cache=None: list(links)
+
+    return main.app
+
+
+def read_kb(path: str, field: str):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return 0
+
+
+def get_process_tree(root_pid: int):
+    children = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The command name may contain spaces, the ppid follows it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+        children.setdefault(ppid, []).append(int(pid))
+
+    tree = [root_pid]
+    for pid in tree:
+        tree.extend(children.get(pid, []))
+
+    return tree
+
+
+def get_memory_mb(root_pid: int):
+    pids = get_process_tree(root_pid)
+
+    pss = sum(read_kb(f"/proc/{pid}/smaps_rollup", "Pss") for pid in pids)
+    rss = sum(read_kb(f"/proc/{pid}/status", "VmRSS") for pid in pids)
+
+    return pss / 1024, rss / 1024
+
+
+def fetch(url: str):
+    request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.read()
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    # A single worker logs its startup before it binds the port
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def start_stand_ins(port: int):
+    import uvicorn
+    from batch_stand_in import app as stand_in_app
+
+    ArticleHandler.fetches = 0
+    article_server = ThreadingHTTPServer(("127.0.0.1", port), ArticleHandler)
+    threading.Thread(target=article_server.serve_forever, daemon=True).start()
+
+    stand_in = uvicorn.Server(
+        uvicorn.Config(
+            stand_in_app, host="127.0.0.1", port=port + 1, log_level="warning"
+        )
+    )
+    stand_in_thread = threading.Thread(target=stand_in.run, daemon=True)
+    stand_in_thread.start()
+    wait_for_port(port + 1)
+
+    return article_server, stand_in, stand_in_thread
+
+
+def benchmark(
+    num_workers: int, server_dir: str, port: int, live: bool, num_members: int
+):
+    article_server, stand_in, stand_in_thread = start_stand_ins(port + 1)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        # Fresh host state for every run so the first worker always builds
+        env = dict(
+            os.environ,
+            SHARED_STATE_DIR=state_dir,
+            HISTORY_DB_PATH=os.path.join(state_dir, "history.db"),
+            OPENAI_API_KEY="benchmark",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{port + 2}/v1",
+            BENCHMARK_ARTICLES_URL=f"http://127.0.0.1:{port + 1}",
+            # The factory lives here, main in --server-dir
+            PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+        if not live:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "from shared_state import load_shared_roster;"
+                    "from benchmark_workers import fake_get_congress_members;"
+                    "load_shared_roster(fake_get_congress_members)",
+                ],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=env,
+                check=True,
+            )
+
+        start = time.time()
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "--factory",
+                "benchmark_workers:create_app",
+                "--workers",
+                str(num_workers),
+                "--port",
+                str(port),
+            ],
+            cwd=server_dir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+        ready = threading.Event()
+        started = []
+
+        def read_logs():
+            for line in server.stderr:
+                if "Application startup complete" in line:
+                    started.append(time.time() - start)
+                    if len(started) == num_workers:
+                        ready.set()
+
+        threading.Thread(target=read_logs, daemon=True).start()
+
+        try:
+            if not ready.wait(timeout=300):
+                raise RuntimeError(f"Only {len(started)} of {num_workers} workers started")
+
+            ready_seconds = max(started)
+            wait_for_port(port)
+
+            # Enough requests that every worker serves every payload
+            base_url = f"http://127.0.0.1:{port}"
+            for _ in range(4 * num_workers):
+                for congress in ("house", "senate"):
+                    for zoom in (3, 4, 5, 7):
+                        fetch(f"{base_url}/choropleth?congress={congress}&zoom={zoom}")
+
+            # One report per member, spread over the workers
+            names = [f"Rep. Representative {i}" for i in range(num_members)]
+            with ThreadPoolExecutor(max_workers=num_workers) as ex:
+                list(
+                    ex.map(
+                        lambda name: fetch(
+                            f"{base_url}/member_feedback?"
+                            + urllib.parse.urlencode({"name": name})
+                        ),
+                        names,
+                    )
+                )
+
+            distinct_articles = len(
+                {i for member in range(num_members) for i in get_member_article_ids(member)}
+            )
+
+            pss_mb, rss_mb = get_memory_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+            article_server.shutdown()
+            article_server.server_close()
+            # Free the ports for the next run
+            stand_in.should_exit = True
+            stand_in_thread.join()
+
+    return ready_seconds, pss_mb, rss_mb, ArticleHandler.fetches, distinct_articles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--server-dir", default=os.path.dirname(os.path.abspath(__file__))
+    )
+    parser.add_argument(
+        "--live", action="store_true", help="Call Congress.gov instead of a stand-in"
+    )
+    parser.add_argument("--members", type=int, default=24)
+    args = parser.parse_args()
+
+    print(
+        f"{'workers':>8}{'ready (s)':>12}{'total PSS (MB)':>18}{'total RSS (MB)':>18}"
+        f"{'fetches':>10}{'articles':>10}"
+    )
+
+    for num_workers in args.workers:
+        ready_seconds, pss_mb, rss_mb, fetches, articles = benchmark(
+            num_workers, args.server_dir, args.port, args.live, args.members
+        )
+        print(
+            f"{num_workers:>8}{ready_seconds:>12.2f}{pss_mb:>18.1f}{rss_mb:>18.1f}"
+            f"{fetches:>10}{articles:>10}"
+        )
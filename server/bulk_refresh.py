@@ -0,0 +1,331 @@
+# python bulk_refresh.py --limit 25
+# Regenerates the reports of every member through the OpenAI Batch API, off the
+# request path, and loads them into the shared report cache and history store.
+# They stay cached for BULK_REPORT_MAX_AGE_SECONDS (36 hours by default).
+# Set OPENAI_BASE_URL=http://localhost:8001/v1 to run against batch_stand_in.py
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import OpenAI
+from congress_members import get_congress_members
+from embeddings import EMBEDDING_MODEL, clean_texts
+from rep_feedback import (
+    OpenAIResponse,
+    REP_FEEDBACK_MODEL,
+    get_rep_feedback_input,
+    get_rep_feedback_text_format,
+)
+from shared_state import load_shared_roster
+import main
+
+
+logger = logging.getLogger("bulk_refresh")
+
+# Batch API limits per input file
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+
+def get_member_names(house_rep_members, senate_members):
+    # Same names the client sends to /member_feedback, so the cache keys match
+    return ["Rep. " + m.name for m in house_rep_members] + [
+        "Senator " + m.name for m in senate_members
+    ]
+
+
+def gather_corpora(names: list[str], limit: int = 25, max_workers: int = 4):
+    corpora = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        future_map = {
+            ex.submit(main.get_member_articles, name, limit): name for name in names
+        }
+
+        for future in as_completed(future_map):
+            name = future_map[future]
+            try:
+                corpora[name] = future.result()
+            except Exception as e:
+                logger.error(f"An error occured while gathering articles for {name}: {e}")
+
+    return corpora
+
+
+def get_report_requests(corpora):
+    requests = []
+
+    for name, (_, article_data) in corpora.items():
+        body = {
+            "model": REP_FEEDBACK_MODEL,
+            "input": get_rep_feedback_input(
+                main.get_scraped_text(article_data), name, filter_name=True
+            ),
+            "text": {
+                "format": get_rep_feedback_text_format(),
+                "verbosity": "low",
+            },
+        }
+
+        requests.append(
+            {
+                "custom_id": name,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": body,
+            }
+        )
+
+    return requests
+
+
+def get_embedding_requests(
+    corpora, model: str = EMBEDDING_MODEL, batch_size: int = 32
+):
+    # Returns the requests and custom_id -> texts so the vectors can be
+    # matched back up
+    requests = []
+    request_texts = {}
+    seen = set()
+
+    for name, (_, article_data) in corpora.items():
+        # The same cleaned texts get_projected_article_data will embed
+        texts, _ = clean_texts([item.get("text", "") for item in article_data], name)
+        texts = [
+            text
+            for text in dict.fromkeys(texts)
+            if text not in seen
+            and main.article_index.find_embedding(text, model)[0] is None
+        ]
+        seen.update(texts)
+
+        for i in range(0, len(texts), batch_size):
+            custom_id = f"{name}|{i}"
+            request_texts[custom_id] = texts[i : i + batch_size]
+
+            requests.append(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/embeddings",
+                    "body": {"model": model, "input": request_texts[custom_id]},
+                }
+            )
+
+    return requests, request_texts
+
+
+def write_batch_files(requests, batch_dir: str, prefix: str):
+    # Starts a new file whenever the next request would exceed the Batch API
+    # limits on requests or bytes per input file
+    paths = []
+    f = None
+    num_requests = num_bytes = 0
+
+    try:
+        for request in requests:
+            line = (json.dumps(request) + "\n").encode()
+
+            if (
+                f is None
+                or num_requests >= MAX_BATCH_REQUESTS
+                or num_bytes + len(line) > MAX_BATCH_BYTES
+            ):
+                if f is not None:
+                    f.close()
+
+                paths.append(os.path.join(batch_dir, f"{prefix}-{len(paths)}.jsonl"))
+                f = open(paths[-1], "wb")
+                num_requests = num_bytes = 0
+
+            f.write(line)
+            num_requests += 1
+            num_bytes += len(line)
+    finally:
+        if f is not None:
+            f.close()
+
+    return paths
+
+
+def submit_batch(openai_client: OpenAI, path: str, endpoint: str):
+    with open(path, "rb") as f:
+        input_file = openai_client.files.create(file=f, purpose="batch")
+
+    batch = openai_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=endpoint,
+        completion_window="24h",
+    )
+    logger.info(f"Submitted batch {batch.id} for {endpoint}")
+
+    return batch.id
+
+
+def wait_for_batch(openai_client: OpenAI, batch_id: str, poll_seconds: float = 30):
+    while True:
+        batch = openai_client.batches.retrieve(batch_id)
+
+        if batch.status == "completed":
+            return batch
+
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} ended with status {batch.status}")
+
+        time.sleep(poll_seconds)
+
+
+def wait_for_results(openai_client: OpenAI, batch_ids, poll_seconds: float = 30):
+    # Merges the results of every batch, skipping (and logging) failed ones
+    results = {}
+
+    for batch_id in batch_ids:
+        try:
+            batch = wait_for_batch(openai_client, batch_id, poll_seconds)
+        except Exception as e:
+            logger.error(f"An error occured while waiting for batch {batch_id}: {e}")
+            continue
+
+        results.update(read_batch_results(openai_client, batch))
+
+    return results
+
+
+def read_batch_results(openai_client: OpenAI, batch):
+    # Returns custom_id -> response body for every successful request
+    results = {}
+
+    if not batch.output_file_id:
+        return results
+
+    content = openai_client.files.content(batch.output_file_id).text
+
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        item = json.loads(line)
+        response = item.get("response") or {}
+
+        if item.get("error") or response.get("status_code") != 200:
+            logger.error(
+                f"Batch request {item.get('custom_id')} failed: "
+                f"{item.get('error') or response.get('body')}"
+            )
+            continue
+
+        results[item["custom_id"]] = response["body"]
+
+    return results
+
+
+def parse_report_body(body) -> OpenAIResponse:
+    for output in body.get("output", []):
+        if output.get("type") != "message":
+            continue
+
+        for content in output.get("content", []):
+            if content.get("type") == "output_text":
+                return OpenAIResponse.model_validate_json(content["text"])
+
+    raise ValueError("No output text in response")
+
+
+def run_bulk_refresh(
+    openai_client: OpenAI,
+    names: list[str],
+    limit: int = 25,
+    poll_seconds: float = 30,
+):
+    corpora = gather_corpora(names, limit=limit)
+    logger.info(f"Gathered articles for {len(corpora)} of {len(names)} members")
+
+    # Members without any usable article text cannot get a report, so no
+    # request is paid for them
+    for name, (_, article_data) in list(corpora.items()):
+        texts, _ = clean_texts([item.get("text", "") for item in article_data], name)
+        if not texts:
+            logger.info(f"Skipping {name}, no usable article text")
+            del corpora[name]
+
+    report_requests = get_report_requests(corpora)
+    # build_report embeds with EMBEDDING_MODEL, so the batch must as well
+    embedding_requests, embedding_texts = get_embedding_requests(corpora)
+
+    with tempfile.TemporaryDirectory() as batch_dir:
+        report_batch_ids = [
+            submit_batch(openai_client, path, "/v1/responses")
+            for path in write_batch_files(report_requests, batch_dir, "reports")
+        ]
+        embedding_batch_ids = [
+            submit_batch(openai_client, path, "/v1/embeddings")
+            for path in write_batch_files(embedding_requests, batch_dir, "embeddings")
+        ]
+
+    # Load the vectors first so building the reports makes no embedding
+    # calls. Texts whose batch failed are embedded synchronously instead.
+    embeddings_loaded = 0
+    for custom_id, body in wait_for_results(
+        openai_client, embedding_batch_ids, poll_seconds
+    ).items():
+        texts = embedding_texts.get(custom_id, [])
+        # The API does not promise to return the inputs in order
+        for d in body["data"]:
+            main.article_index.add_embedding(
+                texts[d["index"]], EMBEDDING_MODEL, d["embedding"]
+            )
+            embeddings_loaded += 1
+
+    reports_loaded = 0
+    for name, body in wait_for_results(
+        openai_client, report_batch_ids, poll_seconds
+    ).items():
+        try:
+            article_links, article_data = corpora[name]
+
+            output = main.build_report(
+                name, article_links, article_data, parse_report_body(body)
+            )
+            main.save_report(name, limit, output, max_age=main.bulk_report_max_age)
+
+            reports_loaded += 1
+        except Exception as e:
+            logger.error(f"An error occured while loading the report for {name}: {e}")
+
+    logger.info(
+        f"Loaded {reports_loaded} reports and {embeddings_loaded} embeddings "
+        f"for {len(names)} members"
+    )
+
+    return reports_loaded, embeddings_loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--poll-seconds", type=float, default=30)
+    parser.add_argument(
+        "--members", type=int, default=None, help="Only refresh the first N members"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    house_rep_members, senate_members = load_shared_roster(
+        lambda: get_congress_members(api_key=main.congress_gov_api_key),
+        max_age=main.roster_max_age,
+    )
+
+    # find_member in save_report reads the roster from the app state
+    main.app.state.house_rep_members = house_rep_members
+    main.app.state.senate_members = senate_members
+
+    names = get_member_names(house_rep_members, senate_members)[: args.members]
+
+    run_bulk_refresh(
+        main.openai_client, names, limit=args.limit, poll_seconds=args.poll_seconds
+    )
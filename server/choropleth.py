@@ -0,0 +1,497 @@
+import gzip
+import hashlib
+import json
+import os
+
+
+# Zoom levels that get their own simplified geometry. Requests snap down to the
+# nearest level so every client hits the same few cacheable URLs.
+ZOOM_LEVELS = (3, 4, 5, 7)
+
+# Features whose simplified area drifts by more than this fraction get their
+# arcs re-simplified with a halved tolerance, up to MAX_REFINEMENTS times, so
+# small districts never collapse at low zoom
+AREA_TOLERANCE = 0.1
+MAX_REFINEMENTS = 8
+
+# Quantization grid, as a fraction of the simplification tolerance
+QUANTIZATION_DIVISOR = 16
+
+# Input coordinates are snapped to micro-degrees so shared borders between
+# neighbouring features compare exactly when building the topology
+COORDINATE_PRECISION = 1_000_000
+
+FIPS_TO_STATE = {
+    "01": "Alabama",
+    "02": "Alaska",
+    "04": "Arizona",
+    "05": "Arkansas",
+    "06": "California",
+    "08": "Colorado",
+    "09": "Connecticut",
+    "10": "Delaware",
+    "11": "District of Columbia",
+    "12": "Florida",
+    "13": "Georgia",
+    "15": "Hawaii",
+    "16": "Idaho",
+    "17": "Illinois",
+    "18": "Indiana",
+    "19": "Iowa",
+    "20": "Kansas",
+    "21": "Kentucky",
+    "22": "Louisiana",
+    "23": "Maine",
+    "24": "Maryland",
+    "25": "Massachusetts",
+    "26": "Michigan",
+    "27": "Minnesota",
+    "28": "Mississippi",
+    "29": "Missouri",
+    "30": "Montana",
+    "31": "Nebraska",
+    "32": "Nevada",
+    "33": "New Hampshire",
+    "34": "New Jersey",
+    "35": "New Mexico",
+    "36": "New York",
+    "37": "North Carolina",
+    "38": "North Dakota",
+    "39": "Ohio",
+    "40": "Oklahoma",
+    "41": "Oregon",
+    "42": "Pennsylvania",
+    "44": "Rhode Island",
+    "45": "South Carolina",
+    "46": "South Dakota",
+    "47": "Tennessee",
+    "48": "Texas",
+    "49": "Utah",
+    "50": "Vermont",
+    "51": "Virginia",
+    "53": "Washington",
+    "54": "West Virginia",
+    "55": "Wisconsin",
+    "56": "Wyoming",
+    "60": "American Samoa",
+    "66": "Guam",
+    "69": "Northern Mariana Islands",
+    "72": "Puerto Rico",
+    "78": "U.S. Virgin Islands",
+}
+
+
+def zoom_tolerance(zoom: int):
+    # Width of one 256px tile pixel at this zoom, in micro-degrees
+    return 360 * COORDINATE_PRECISION / (256 * 2**zoom)
+
+
+def snap_zoom(zoom: float):
+    levels = [level for level in ZOOM_LEVELS if level <= zoom]
+    return levels[-1] if levels else ZOOM_LEVELS[0]
+
+
+def get_polygons(geometry):
+    # Returns a list of polygons, each a list of open rings of integer points
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return []
+
+    out = []
+    for polygon in polygons:
+        rings = []
+        for ring in polygon:
+            points = []
+            for x, y in ring:
+                p = (round(x * COORDINATE_PRECISION), round(y * COORDINATE_PRECISION))
+                if not points or points[-1] != p:
+                    points.append(p)
+
+            # Drop the closing point, rings are handled as cycles
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+
+            if len(points) >= 3:
+                rings.append(points)
+
+        if rings:
+            out.append(rings)
+
+    return out
+
+
+def find_junctions(rings):
+    # A point is a junction when two rings pass through it with different
+    # neighbours, i.e. where a shared border starts or ends
+    neighbors = {}
+    junctions = set()
+
+    for ring in rings:
+        n = len(ring)
+        for i, p in enumerate(ring):
+            a, b = ring[i - 1], ring[(i + 1) % n]
+            pair = (a, b) if a < b else (b, a)
+
+            seen = neighbors.get(p)
+            if seen is None:
+                neighbors[p] = pair
+            elif seen != pair:
+                junctions.add(p)
+
+    return junctions
+
+
+def cut_ring(ring, junctions):
+    starts = [i for i, p in enumerate(ring) if p in junctions]
+
+    if not starts:
+        # Rotate to a canonical start so identical rings (enclaves) share an arc
+        start = ring.index(min(ring))
+        rotated = ring[start:] + ring[:start]
+        return [rotated + [rotated[0]]]
+
+    rotated = ring[starts[0] :] + ring[: starts[0]]
+
+    arcs = []
+    current = [rotated[0]]
+    for p in rotated[1:]:
+        current.append(p)
+        if p in junctions:
+            arcs.append(current)
+            current = [p]
+
+    current.append(rotated[0])
+    arcs.append(current)
+
+    return arcs
+
+
+def simplify_arc(points, tolerance):
+    # Douglas-Peucker with fixed endpoints so shared arcs stay watertight
+    n = len(points)
+    if n <= 2:
+        return points
+
+    if points[0] == points[-1]:
+        # Closed arc, split at the farthest point so the ring keeps its extent
+        x0, y0 = points[0]
+        far = max(
+            range(1, n - 1),
+            key=lambda i: (points[i][0] - x0) ** 2 + (points[i][1] - y0) ** 2,
+        )
+        return (
+            simplify_arc(points[: far + 1], tolerance)[:-1]
+            + simplify_arc(points[far:], tolerance)
+        )
+
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        s, e = stack.pop()
+        if e - s < 2:
+            continue
+
+        (x1, y1), (x2, y2) = points[s], points[e]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        max_dist_sq = -1.0
+        max_idx = s
+        for i in range(s + 1, e):
+            px, py = points[i]
+            if length_sq == 0:
+                dist_sq = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                cross = dx * (py - y1) - dy * (px - x1)
+                dist_sq = cross * cross / length_sq
+
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                max_idx = i
+
+        if max_dist_sq > tolerance_sq:
+            keep[max_idx] = True
+            stack.append((s, max_idx))
+            stack.append((max_idx, e))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def ring_area(points):
+    # Shoelace formula, unsigned
+    return abs(
+        sum(
+            x1 * y2 - x2 * y1
+            for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1])
+        )
+    ) / 2
+
+
+def feature_area(feature_arcs, arcs):
+    area = 0.0
+
+    for polygon in feature_arcs:
+        for ring_idx, ring in enumerate(polygon):
+            points = []
+            for i in ring:
+                arc = arcs[i] if i >= 0 else arcs[~i][::-1]
+                points.extend(arc[1:] if points else arc)
+
+            # The first ring is the outer boundary, the rest are holes
+            area += ring_area(points) if ring_idx == 0 else -ring_area(points)
+
+    return area
+
+
+def quantize_arc(points, origin, step):
+    # Quantize to the zoom's grid and delta-encode as TopoJSON expects
+    x0, y0 = origin
+    out = []
+    prev_x, prev_y = 0, 0
+
+    for x, y in points:
+        qx = round((x - x0) / step)
+        qy = round((y - y0) / step)
+
+        if out and qx == prev_x and qy == prev_y:
+            continue
+
+        out.append([qx - prev_x, qy - prev_y])
+        prev_x, prev_y = qx, qy
+
+    if len(out) < 2:
+        out.append([0, 0])
+
+    return out
+
+
+class ChoroplethLayer:
+    # Builds a shared-arc topology from a GeoJSON file once, then precomputes
+    # simplified and quantized arcs for every zoom level. Only the joined
+    # member properties change at runtime, so the encoded arcs are reused for
+    # every payload.
+
+    def __init__(self, geojson_path: str, object_name: str):
+        with open(geojson_path, "r") as f:
+            geojson = json.load(f)
+
+        self.object_name = object_name
+        self.feature_properties = []
+        self.feature_arcs = []
+
+        features = []
+        for feature in geojson["features"]:
+            polygons = get_polygons(feature.get("geometry") or {})
+            if polygons:
+                features.append((feature.get("properties") or {}, polygons))
+
+        junctions = find_junctions(
+            [ring for _, polygons in features for rings in polygons for ring in rings]
+        )
+
+        arcs = []
+        arc_index = {}
+
+        def add_arc(points):
+            key = tuple(points)
+            if key in arc_index:
+                return arc_index[key]
+
+            reversed_key = key[::-1]
+            if reversed_key in arc_index:
+                return ~arc_index[reversed_key]
+
+            arc_index[key] = len(arcs)
+            arcs.append(points)
+            return arc_index[key]
+
+        for properties, polygons in features:
+            self.feature_properties.append(properties)
+            self.feature_arcs.append(
+                [
+                    [[add_arc(arc) for arc in cut_ring(ring, junctions)] for ring in rings]
+                    for rings in polygons
+                ]
+            )
+
+        min_x = min(x for arc in arcs for x, _ in arc)
+        min_y = min(y for arc in arcs for _, y in arc)
+
+        self.num_points = sum(len(arc) for arc in arcs)
+        self.levels = {}
+
+        original_areas = [
+            feature_area(feature_arcs, arcs) for feature_arcs in self.feature_arcs
+        ]
+
+        for zoom in ZOOM_LEVELS:
+            tolerance = zoom_tolerance(zoom)
+            step = tolerance / QUANTIZATION_DIVISOR
+
+            arc_tolerances = [tolerance] * len(arcs)
+            simplified_arcs = [simplify_arc(arc, tolerance) for arc in arcs]
+
+            for _ in range(MAX_REFINEMENTS):
+                refine = set()
+                for feature_arcs, area in zip(self.feature_arcs, original_areas):
+                    simplified_area = feature_area(feature_arcs, simplified_arcs)
+                    if abs(simplified_area - area) > AREA_TOLERANCE * area:
+                        refine.update(
+                            i if i >= 0 else ~i
+                            for polygon in feature_arcs
+                            for ring in polygon
+                            for i in ring
+                        )
+
+                if not refine:
+                    break
+
+                # Shared arcs stay shared, so neighbours remain watertight
+                for i in refine:
+                    arc_tolerances[i] /= 2
+                    simplified_arcs[i] = simplify_arc(arcs[i], arc_tolerances[i])
+
+            encoded_arcs = [
+                quantize_arc(arc, (min_x, min_y), step) for arc in simplified_arcs
+            ]
+
+            transform = {
+                "scale": [step / COORDINATE_PRECISION, step / COORDINATE_PRECISION],
+                "translate": [
+                    min_x / COORDINATE_PRECISION,
+                    min_y / COORDINATE_PRECISION,
+                ],
+            }
+
+            self.levels[zoom] = (
+                json.dumps(transform, separators=(",", ":")),
+                json.dumps(encoded_arcs, separators=(",", ":")),
+            )
+
+    def encode(self, zoom: int, properties: list[dict]):
+        transform_json, arcs_json = self.levels[zoom]
+
+        geometries = []
+        for feature_arcs, props in zip(self.feature_arcs, properties):
+            if len(feature_arcs) == 1:
+                geometry = {"type": "Polygon", "arcs": feature_arcs[0]}
+            else:
+                geometry = {"type": "MultiPolygon", "arcs": feature_arcs}
+
+            geometry["properties"] = props
+            geometries.append(geometry)
+
+        objects = {
+            self.object_name: {"type": "GeometryCollection", "geometries": geometries}
+        }
+
+        return (
+            '{"type":"Topology","transform":'
+            + transform_json
+            + ',"objects":'
+            + json.dumps(objects, separators=(",", ":"))
+            + ',"arcs":'
+            + arcs_json
+            + "}"
+        ).encode("utf-8")
+
+    def get_payload(self, zoom: float, properties: list[dict]):
+        # Returns the gzipped TopoJSON and its ETag for a zoom level
+        body = self.encode(snap_zoom(zoom), properties)
+        payload = gzip.compress(body, compresslevel=9)
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+
+        return payload, etag
+
+
+def get_house_properties(layer: ChoroplethLayer, house_rep_members, sentiments):
+    members_by_district = {}
+    members_by_state = {}
+
+    for member in house_rep_members:
+        members_by_district[(member.state, member.district)] = member
+        members_by_state.setdefault(member.state, member)
+
+    properties = []
+    for raw in layer.feature_properties:
+        geoid = str(raw.get("GEOID", ""))
+        state = FIPS_TO_STATE.get(raw.get("STATEFP", ""), "")
+        district_code = geoid[2:]
+
+        if district_code in ("00", "98"):
+            # At-large districts
+            member = members_by_state.get(state)
+        else:
+            member = members_by_district.get(
+                (state, int(district_code) if district_code.isdigit() else None)
+            )
+
+        properties.append(
+            {
+                "GEOID": geoid,
+                "STATEFP": raw.get("STATEFP", ""),
+                "NAMELSAD": raw.get("NAMELSAD", ""),
+                "state": state,
+                "bucket": int(geoid) % 14 if geoid.isdigit() else 0,
+                "name": member.name if member else "",
+                "partyName": member.partyName if member else "",
+                "pulseSentiment": sentiments.get(member.name) if member else None,
+            }
+        )
+
+    return properties
+
+
+def get_senate_properties(layer: ChoroplethLayer, senate_members, sentiments):
+    members_by_state = {}
+    for member in senate_members:
+        members_by_state.setdefault(member.state, []).append(member)
+
+    properties = []
+    for raw in layer.feature_properties:
+        geoid = str(raw.get("GEOID", ""))
+        state = FIPS_TO_STATE.get(raw.get("STATEFP", ""), "")
+
+        properties.append(
+            {
+                "GEOID": geoid,
+                "STATEFP": raw.get("STATEFP", ""),
+                "STUSPS": raw.get("STUSPS", ""),
+                "NAMELSAD": raw.get("NAMELSAD", ""),
+                "state": state,
+                "bucket": int(geoid) % 14 if geoid.isdigit() else 0,
+                "senators": [
+                    {
+                        "name": member.name,
+                        "partyName": member.partyName,
+                        "pulseSentiment": sentiments.get(member.name),
+                    }
+                    for member in members_by_state.get(state, [])
+                ],
+            }
+        )
+
+    return properties
+
+
+def get_choropleth_layers(data_dir: str | None = None):
+    if data_dir is None:
+        data_dir = os.getenv(
+            "GEO_DATA_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"),
+        )
+
+    return {
+        "house": ChoroplethLayer(
+            os.path.join(data_dir, "us_cd_119.geojson"), object_name="districts"
+        ),
+        "senate": ChoroplethLayer(
+            os.path.join(data_dir, "us_state.geojson"), object_name="states"
+        ),
+    }
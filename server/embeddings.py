@@ -20,20 +20,35 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+EMBEDDING_MODEL = "text-embedding-3-large"
+
 
 def openai_embed(
-    texts: list[str], model: str = "text-embedding-3-large", batch_size: int = 32
+    texts: list[str],
+    model: str = EMBEDDING_MODEL,
+    batch_size: int = 32,
+    article_index=None,
 ):
-    # Batched embeddings
-    vectors = []
+    # Reuse embeddings of the same or near-duplicate texts
+    vectors = [None] * len(texts)
+    if article_index is not None:
+        vectors = [article_index.get_embedding(text, model) for text in texts]
+
+    missing = [i for i, v in enumerate(vectors) if v is None]
 
-    for i in range(0, len(texts), batch_size):
-        batched_texts = texts[i : i + batch_size]
+    # Batched embeddings
+    for i in range(0, len(missing), batch_size):
+        batched_idxs = missing[i : i + batch_size]
+        batched_texts = [texts[j] for j in batched_idxs]
 
         # Send API Request to OpenAI for text embeddings
         response = client.embeddings.create(model=model, input=batched_texts)
 
-        vectors.extend([d.embedding for d in response.data])
+        for j, text, d in zip(batched_idxs, batched_texts, response.data):
+            vectors[j] = d.embedding
+
+            if article_index is not None:
+                article_index.add_embedding(text, model, d.embedding)
 
     return np.asarray(vectors, dtype=np.float32)  # shape: (N, D)
 
@@ -80,9 +95,11 @@ def label_with_tfidf(cluster_texts, top_k: int = 2):
     return ", ".join(feats)
 
 
-def cluster_and_project(texts, num_topics: int = 5, random_state: int = 42):
+def cluster_and_project(
+    texts, num_topics: int = 5, random_state: int = 42, article_index=None
+):
     # Embed the articles
-    embeddings = openai_embed(texts)
+    embeddings = openai_embed(texts, article_index=article_index)
     embeddings = normalize(embeddings)  # shape: (N, D) L2 normalized embeddings
 
     # K-Means Clustering
@@ -132,6 +149,7 @@ def get_projected_article_data(
     rep_name: str,
     num_topics: int = 5,
     show_plot: bool = False,
+    article_index=None,
 ):
     df = pd.DataFrame(article_data)
 
@@ -144,7 +162,10 @@ def get_projected_article_data(
 
     # Cluster and project
     labels, titles, tsne_coordinates, pca_coordinates, embeddings = cluster_and_project(
-        texts_clean, num_topics=num_topics, random_state=42
+        texts_clean,
+        num_topics=num_topics,
+        random_state=42,
+        article_index=article_index,
     )
 
     df["cluster"] = labels
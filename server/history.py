@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pydantic import BaseModel
+from shared_state import get_shared_state_dir
+
+
+BUCKET_SECONDS = 86400  # Rollups are aggregated per day
+
+
+class SentimentPoint(BaseModel):
+    timestamp: float
+    pulseSentiment: int
+    article_count: int
+    topics: list[str]
+
+
+class RollupPoint(BaseModel):
+    # Every member counts once per bucket, however often their report was requested
+    bucket: float
+    member_count: int
+    mean_sentiment: float
+    mean_article_count: float
+
+
+class SentimentHistoryResponse(BaseModel):
+    name: str
+    chamber: str
+    state: str
+    partyName: str
+    series: list[SentimentPoint]
+    chamber_rollup: list[RollupPoint]
+    state_rollup: list[RollupPoint]
+    party_rollup: list[RollupPoint]
+
+
+class HistoryStore:
+    # Append-only store of report snapshots. Each member keeps one aggregate
+    # row per bucket, and the group rollups (chamber, state, party) sum those
+    # members' means. Both are maintained incrementally on every insert, so
+    # trend queries only read pre-aggregated rows and never scan the history.
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                chamber TEXT NOT NULL,
+                state TEXT NOT NULL,
+                party TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                pulse_sentiment INTEGER NOT NULL,
+                article_count INTEGER NOT NULL,
+                topics TEXT NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_snapshots_name_time
+                ON snapshots (name, created_at);
+
+            CREATE TABLE IF NOT EXISTS member_buckets (
+                name TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sentiment_sum INTEGER NOT NULL,
+                article_sum INTEGER NOT NULL,
+                PRIMARY KEY (name, bucket)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS group_rollups (
+                group_type TEXT NOT NULL,
+                group_value TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                member_count INTEGER NOT NULL,
+                sentiment_sum REAL NOT NULL,
+                article_sum REAL NOT NULL,
+                PRIMARY KEY (group_type, group_value, bucket)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS latest (
+                name TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                pulse_sentiment INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+
+        self.conn.commit()
+
+    def record_snapshot(
+        self,
+        name: str,
+        chamber: str,
+        state: str,
+        party: str,
+        pulse_sentiment: int,
+        article_count: int,
+        topics: list[str],
+        created_at: float | None = None,
+    ):
+        if created_at is None:
+            created_at = time.time()
+
+        bucket = int(created_at // BUCKET_SECONDS) * BUCKET_SECONDS
+
+        groups = [
+            (group_type, group_value)
+            for group_type, group_value in (
+                ("chamber", chamber),
+                ("state", state),
+                ("party", party),
+            )
+            if group_value
+        ]
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO snapshots (
+                    name, chamber, state, party, created_at,
+                    pulse_sentiment, article_count, topics
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    name,
+                    chamber,
+                    state,
+                    party,
+                    created_at,
+                    pulse_sentiment,
+                    article_count,
+                    json.dumps(topics),
+                ),
+            )
+
+            # Update the member's bucket and swap its old mean for the new one
+            # in the rollups, all in the same transaction as the snapshot
+            row = self.conn.execute(
+                """
+                SELECT count, sentiment_sum, article_sum
+                FROM member_buckets
+                WHERE name = ? AND bucket = ?
+                """,
+                (name, bucket),
+            ).fetchone()
+
+            if row:
+                count, sentiment_sum, article_sum = row
+                old_sentiment_mean = sentiment_sum / count
+                old_article_mean = article_sum / count
+                new_member = 0
+            else:
+                count, sentiment_sum, article_sum = 0, 0, 0
+                old_sentiment_mean = old_article_mean = 0.0
+                new_member = 1
+
+            count += 1
+            sentiment_sum += pulse_sentiment
+            article_sum += article_count
+
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO member_buckets (
+                    name, bucket, count, sentiment_sum, article_sum
+                ) VALUES (?, ?, ?, ?, ?)
+                """,
+                (name, bucket, count, sentiment_sum, article_sum),
+            )
+
+            self.conn.executemany(
+                """
+                INSERT INTO group_rollups (
+                    group_type, group_value, bucket, member_count, sentiment_sum, article_sum
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (group_type, group_value, bucket) DO UPDATE SET
+                    member_count = member_count + excluded.member_count,
+                    sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+                    article_sum = article_sum + excluded.article_sum
+                """,
+                [
+                    (
+                        group_type,
+                        group_value,
+                        bucket,
+                        new_member,
+                        sentiment_sum / count - old_sentiment_mean,
+                        article_sum / count - old_article_mean,
+                    )
+                    for group_type, group_value in groups
+                ],
+            )
+
+            self.conn.execute(
+                """
+                INSERT INTO latest (name, created_at, pulse_sentiment)
+                VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    created_at = excluded.created_at,
+                    pulse_sentiment = excluded.pulse_sentiment
+                WHERE excluded.created_at >= latest.created_at
+                """,
+                (name, created_at, pulse_sentiment),
+            )
+
+    def get_member_series(
+        self, name: str, since: float = 0.0, limit: int = 365
+    ) -> list[SentimentPoint]:
+        with self.lock:
+            # Most recent points first so the limit keeps the newest history
+            rows = self.conn.execute(
+                """
+                SELECT created_at, pulse_sentiment, article_count, topics
+                FROM snapshots
+                WHERE name = ? AND created_at >= ?
+                ORDER BY created_at DESC
+                LIMIT ?
+                """,
+                (name, since, limit),
+            ).fetchall()
+
+        return [
+            SentimentPoint(
+                timestamp=created_at,
+                pulseSentiment=pulse_sentiment,
+                article_count=article_count,
+                topics=json.loads(topics),
+            )
+            for created_at, pulse_sentiment, article_count, topics in reversed(rows)
+        ]
+
+    def get_rollup(
+        self, group_type: str, group_value: str, since: float = 0.0
+    ) -> list[RollupPoint]:
+        if not group_value:
+            return []
+
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT bucket, member_count, sentiment_sum, article_sum
+                FROM group_rollups
+                WHERE group_type = ? AND group_value = ? AND bucket >= ?
+                ORDER BY bucket
+                """,
+                (group_type, group_value, int(since // BUCKET_SECONDS) * BUCKET_SECONDS),
+            ).fetchall()
+
+        return [
+            RollupPoint(
+                bucket=bucket,
+                member_count=member_count,
+                mean_sentiment=sentiment_sum / member_count,
+                mean_article_count=article_sum / member_count,
+            )
+            for bucket, member_count, sentiment_sum, article_sum in rows
+        ]
+
+    def get_latest_sentiments(self) -> dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, pulse_sentiment FROM latest"
+            ).fetchall()
+
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def get_history_store(db_path: str | None = None) -> HistoryStore:
+    if db_path is None:
+        # Next to the rest of the host state, so every worker shares it
+        # whatever its working directory
+        db_path = os.getenv(
+            "HISTORY_DB_PATH",
+            os.path.join(get_shared_state_dir(), "sentiment_history.db"),
+        )
+
+    return HistoryStore(db_path)
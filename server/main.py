@@ -1,7 +1,7 @@
 # uvicorn main:app --reload
 # /docs for API documentation
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import logging
@@ -17,6 +17,26 @@ from contextlib import asynccontextmanager
 from openai import OpenAI
 from rep_feedback import get_ai_rep_feedback
 from embeddings import get_projected_article_data
+from history import get_history_store, SentimentHistoryResponse
+from choropleth import (
+    ZOOM_LEVELS,
+    get_choropleth_layers,
+    get_house_properties,
+    get_senate_properties,
+    snap_zoom,
+)
+from article_index import ArticleIndex
+from shared_state import (
+    get_shared_cache,
+    get_shared_state_dir,
+    load_shared_payload,
+    load_shared_roster,
+)
+import glob
+import gzip
+import hashlib
+import json
+import time
 
 
 logger = logging.getLogger("uvicorn.error")
@@ -24,6 +44,11 @@ logger = logging.getLogger("uvicorn.error")
 load_dotenv()
 congress_gov_api_key = os.getenv("CONGRESS_GOV_API_KEY")
 openai_api_key = os.getenv("OPENAI_API_KEY")
+roster_max_age = float(os.getenv("ROSTER_MAX_AGE_SECONDS", 6 * 3600))
+report_max_age = float(os.getenv("REPORT_MAX_AGE_SECONDS", 3600))
+# Reports from bulk_refresh.py outlive a daily refresh, so they never lapse
+# between runs
+bulk_report_max_age = float(os.getenv("BULK_REPORT_MAX_AGE_SECONDS", 36 * 3600))
 
 
 class ReportResponse(BaseModel):
@@ -49,8 +74,10 @@ class ReportResponse(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
-        house_rep_members, senate_members = get_congress_members(
-            api_key=congress_gov_api_key
+        # Only one worker per host calls Congress.gov, the others read its snapshot
+        house_rep_members, senate_members = load_shared_roster(
+            lambda: get_congress_members(api_key=congress_gov_api_key),
+            max_age=roster_max_age,
         )
 
         logger.info(f"Loaded {len(house_rep_members)} House of Representatives members")
@@ -59,6 +86,18 @@ async def lifespan(app: FastAPI):
         app.state.house_rep_members = house_rep_members
         app.state.senate_members = senate_members
 
+        try:
+            # The first worker on the host precomputes every payload, the
+            # others find them in the shared directory and never build the
+            # map geometry at all
+            for congress in ("house", "senate"):
+                for zoom in ZOOM_LEVELS:
+                    get_choropleth_payload(congress, zoom)
+
+            logger.info("Loaded choropleth payloads")
+        except Exception as e:
+            logger.error(f"An error occured while building the choropleth payloads: {e}")
+
         yield
     except Exception as e:
         logger.error(f"An error occured while starting the API: {e}")
@@ -78,6 +117,27 @@ app.add_middleware(
 )
 
 openai_client = OpenAI(api_key=openai_api_key)
+history_store = get_history_store()
+shared_cache = get_shared_cache()
+article_index = ArticleIndex(shared_cache=shared_cache)
+
+
+def find_member(name: str):
+    # The client prefixes names with "Rep. " or "Senator "
+    for prefix in ("Rep. ", "Senator "):
+        if name.startswith(prefix):
+            name = name[len(prefix) :]
+            break
+
+    for chamber, members in (
+        ("House of Representatives", getattr(app.state, "house_rep_members", [])),
+        ("Senate", getattr(app.state, "senate_members", [])),
+    ):
+        for member in members:
+            if member.name == name:
+                return chamber, member
+
+    return None, None
 
 
 @app.get("/")
@@ -111,35 +171,68 @@ def senate_members(limit: int = 100) -> list[Congressperson]:
         )
 
 
-@app.get("/member_feedback", response_model=ReportResponse)
-def get_member_feedback(name: str, limit: int = 25) -> ReportResponse:
+def get_member_articles(name: str, limit: int = 25):
     google_news_articles_rss = get_google_news_articles_rss(name, limit=limit)
 
-    google_news_articles_rss_links = [
-        article.link for article in google_news_articles_rss
-    ]
+    # Syndicated copies already scraped from another outlet are matched on the
+    # RSS title, so neither their redirect nor the article is fetched again
+    known_links = []
+    google_news_articles_rss_links = []
+    for article in google_news_articles_rss:
+        cached = article_index.get_article_by_title(
+            article.get("title", ""), article.get("source", {}).get("href", "")
+        )
+        if cached:
+            known_links.append(cached["url"])
+        else:
+            google_news_articles_rss_links.append(article.link)
+
+    article_links = get_google_rss_redirect_links(
+        google_news_articles_rss_links, shared_cache=shared_cache
+    )
+    article_links = list(dict.fromkeys(known_links + article_links))
+
+    article_data = scrape_articles(article_links, article_index=article_index)
+
+    logger.info(
+        f"Downloaded {sum(item.get('bytes_read', 0) for item in article_data)} bytes, "
+        f"parsed {sum(item.get('body_bytes', 0) for item in article_data)} bytes, "
+        f"stopped {sum(bool(item.get('truncated')) for item in article_data)} "
+        f"articles early, saving at least "
+        f"{sum(item.get('bytes_saved', 0) for item in article_data)} bytes"
+    )
+
+    return article_links, article_data
 
-    article_links = get_google_rss_redirect_links(google_news_articles_rss_links)
 
-    article_data = scrape_articles(article_links)
+def get_scraped_text(article_data) -> str:
     scraped_text = ""
 
     for item in article_data:
+        # Syndicated copies would only repeat the same text in the prompt
+        if item.get("duplicate"):
+            continue
+
         scraped_text += item.get("title", "") + "\n"
         scraped_text += item.get("text", "") + "\n\n"
 
-    model_response = get_ai_rep_feedback(
-        openai_client=openai_client,
-        scraped_text=scraped_text,
-        name=name,
-        filter_name=True,
-    )
+    return scraped_text
 
+
+def build_report(
+    name: str, article_links, article_data, model_response
+) -> ReportResponse:
     result_df = get_projected_article_data(
-        article_data, rep_name=name, num_topics=3, show_plot=False
+        article_data,
+        rep_name=name,
+        num_topics=3,
+        show_plot=False,
+        article_index=article_index,
     )
 
-    output = ReportResponse(
+    logger.info(f"Article index stats: {article_index.get_stats()}")
+
+    return ReportResponse(
         **model_response.model_dump(),
         article_links=article_links,
         article_projected_urls=result_df["url"].tolist(),
@@ -152,4 +245,163 @@ def get_member_feedback(name: str, limit: int = 25) -> ReportResponse:
         article_pca_ys=result_df["pca_y"].tolist(),
     )
 
+
+def save_report(
+    name: str, limit: int, output: ReportResponse, max_age: float = report_max_age
+):
+    try:
+        chamber, member = find_member(name)
+
+        history_store.record_snapshot(
+            name=member.name if member else name,
+            chamber=chamber or "",
+            state=member.state if member else "",
+            party=member.partyName if member else "",
+            pulse_sentiment=output.pulseSentiment,
+            article_count=len(output.article_links),
+            topics=sorted(set(output.article_topics)),
+        )
+    except Exception as e:
+        logger.error(f"An error occured while recording the report history: {e}")
+
+    shared_cache.set_report(
+        f"{name}|{limit}", output.model_dump_json(), max_age=max_age
+    )
+
+
+@app.get("/member_feedback", response_model=ReportResponse)
+def get_member_feedback(name: str, limit: int = 25) -> ReportResponse:
+    # Reports generated by any worker on the host are reused for a while
+    cached_report = shared_cache.get_report(f"{name}|{limit}")
+    if cached_report:
+        return ReportResponse.model_validate_json(cached_report)
+
+    article_links, article_data = get_member_articles(name, limit=limit)
+
+    model_response = get_ai_rep_feedback(
+        openai_client=openai_client,
+        scraped_text=get_scraped_text(article_data),
+        name=name,
+        filter_name=True,
+    )
+
+    output = build_report(name, article_links, article_data, model_response)
+    save_report(name, limit, output)
+
     return output
+
+
+def get_choropleth_layer(congress: str):
+    # Only built by workers that have to build a payload
+    if getattr(app.state, "choropleth_layers", None) is None:
+        app.state.choropleth_layers = get_choropleth_layers()
+
+    return app.state.choropleth_layers[congress]
+
+
+def get_choropleth_version(sentiments):
+    # Hash of everything joined into the payloads, so they are only rebuilt
+    # when a member or a latest sentiment actually changes, not on every report
+    joined = [
+        (m.name, m.partyName, m.state, m.district, sentiments.get(m.name))
+        for m in app.state.house_rep_members + app.state.senate_members
+    ]
+
+    return hashlib.sha1(json.dumps(joined).encode()).hexdigest()[:16]
+
+
+def get_choropleth_payload(congress: str, zoom: float):
+    # Payloads are shared by every worker on the host
+    zoom = snap_zoom(zoom)
+    payload_dir = os.path.join(get_shared_state_dir(), "choropleth")
+    os.makedirs(payload_dir, exist_ok=True)
+
+    sentiments = history_store.get_latest_sentiments()
+    version = get_choropleth_version(sentiments)
+    path = os.path.join(payload_dir, f"{congress}-{zoom}-{version}.gz")
+
+    def build_payload():
+        layer = get_choropleth_layer(congress)
+
+        if congress == "house":
+            properties = get_house_properties(
+                layer, app.state.house_rep_members, sentiments
+            )
+        else:
+            properties = get_senate_properties(
+                layer, app.state.senate_members, sentiments
+            )
+
+        # Drop the payloads of older versions, for every congress and zoom
+        for old_path in glob.glob(os.path.join(payload_dir, "*.gz")):
+            if not old_path.endswith(f"-{version}.gz"):
+                os.remove(old_path)
+
+        return layer.get_payload(zoom, properties)
+
+    return load_shared_payload(path, build_payload)
+
+
+@app.get("/choropleth")
+def choropleth(request: Request, congress: str = "house", zoom: float = 3) -> Response:
+    if congress not in ("house", "senate"):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No choropleth geometry available for {congress}",
+        )
+
+    try:
+        payload, etag = get_choropleth_payload(congress, zoom)
+    except Exception as e:
+        logger.error(f"An error occured while getting the choropleth data: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occured while getting the choropleth data: {e}",
+        )
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=3600, stale-while-revalidate=86400",
+        "Vary": "Accept-Encoding",
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" not in request.headers.get("accept-encoding", ""):
+        return Response(
+            content=gzip.decompress(payload),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    headers["Content-Encoding"] = "gzip"
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@app.get("/article_index_stats")
+def article_index_stats() -> dict:
+    return article_index.get_stats()
+
+
+@app.get("/member_sentiment_history", response_model=SentimentHistoryResponse)
+def member_sentiment_history(
+    name: str, days: int = 365, limit: int = 365
+) -> SentimentHistoryResponse:
+    chamber, member = find_member(name)
+    since = time.time() - days * 86400
+
+    member_name = member.name if member else name
+    state = member.state if member else ""
+    party = member.partyName if member else ""
+
+    return SentimentHistoryResponse(
+        name=member_name,
+        chamber=chamber or "",
+        state=state,
+        partyName=party,
+        series=history_store.get_member_series(member_name, since=since, limit=limit),
+        chamber_rollup=history_store.get_rollup("chamber", chamber or "", since=since),
+        state_rollup=history_store.get_rollup("state", state, since=since),
+        party_rollup=history_store.get_rollup("party", party, since=since),
+    )
@@ -10,12 +10,14 @@ class OpenAIResponse(BaseModel):
     pulseSentiment: int
 
 
-def get_ai_rep_feedback(
-    openai_client: OpenAI,
+REP_FEEDBACK_MODEL = "gpt-5-mini"
+
+
+def get_rep_feedback_input(
     scraped_text: str,
     name: str,
     filter_name: bool = False,
-) -> OpenAIResponse:
+) -> list[dict]:
     if filter_name:
         name = name.lower()
         name_words = name.split()
@@ -24,12 +26,10 @@ def get_ai_rep_feedback(
         for word in name_words:
             scraped_text = scraped_text.replace(word, "[NAME HIDDEN]")
 
-    response = openai_client.responses.parse(
-        model="gpt-5-mini",
-        input=[
-            {
-                "role": "system",
-                "content": """
+    return [
+        {
+            "role": "system",
+            "content": """
 You are a precise news analyst. Use and analyze the text from the provided articles, and return a valid JSON response that serves as a report on the congressional representative.
 Output all text in markdown format, emphasizing important content and keywords by making them bold with markdown. Also, never use "[NAME HIDDEN]" in your response.
 Always tend to be more positive in your analysis and scoring, and always prefer positive interpretations. Always place more emphasis on positives and strengths, rather than focusing on any negatives.
@@ -59,9 +59,34 @@ Style & constraints
 	Use gentle wording for any negatives (avoid loaded language).
 	Base all statements on the text from the articles; avoid speculation altogether.
                     """,
-            },
-            {"role": "user", "content": f"ARTICLES TEXT:\n\n{scraped_text}"},
-        ],
+        },
+        {"role": "user", "content": f"ARTICLES TEXT:\n\n{scraped_text}"},
+    ]
+
+
+def get_rep_feedback_text_format() -> dict:
+    # Structured output format equivalent to text_format=OpenAIResponse, for
+    # requests that do not go through responses.parse (e.g. the Batch API)
+    schema = OpenAIResponse.model_json_schema()
+    schema["additionalProperties"] = False
+
+    return {
+        "type": "json_schema",
+        "name": OpenAIResponse.__name__,
+        "schema": schema,
+        "strict": True,
+    }
+
+
+def get_ai_rep_feedback(
+    openai_client: OpenAI,
+    scraped_text: str,
+    name: str,
+    filter_name: bool = False,
+) -> OpenAIResponse:
+    response = openai_client.responses.parse(
+        model=REP_FEEDBACK_MODEL,
+        input=get_rep_feedback_input(scraped_text, name, filter_name=filter_name),
         text_format=OpenAIResponse,
         text={"verbosity": "low"},
     )
@@ -6,7 +6,11 @@ import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+import codecs
 import lxml
+from lxml import etree
+import re
+from article_index import canonicalize_url
 
 
 def get_google_news_articles_rss(keyword: str, limit: int = 25):
@@ -19,8 +23,14 @@ def get_google_news_articles_rss(keyword: str, limit: int = 25):
     return feedparser.parse(url).entries[:limit]
 
 
-def get_google_rss_redirect_links(google_rss_links: list[str]):
-    max_workers = min(8, len(google_rss_links))
+def get_google_rss_redirect_links(google_rss_links: list[str], shared_cache=None):
+    # Redirects resolved by any worker on the host are reused
+    cached_links = {}
+    if shared_cache is not None:
+        cached_links = shared_cache.get_redirects(google_rss_links)
+
+    missing_links = [link for link in google_rss_links if link not in cached_links]
+    max_workers = max(1, min(8, len(missing_links)))
     timeout = (5, 15)  # (connect seconds, read seconds)
 
     google_xssi_prefix = ")]}'"
@@ -95,15 +105,20 @@ def get_google_rss_redirect_links(google_rss_links: list[str]):
             return None
 
     # Run concurrently
-    results = []
+    results = list(cached_links.values())
+    resolved_links = {}
     with ThreadPoolExecutor(max_workers=max_workers) as ex:
         futures = {
-            ex.submit(get_single_redirect_link, link): link for link in google_rss_links
+            ex.submit(get_single_redirect_link, link): link for link in missing_links
         }
         for fut in as_completed(futures):
             url = fut.result()
             if url:
                 results.append(url)
+                resolved_links[futures[fut]] = url
+
+    if shared_cache is not None and resolved_links:
+        shared_cache.set_redirects(resolved_links)
 
     # Deduplicate but preserve order
     seen = set()
@@ -116,84 +131,228 @@ def get_google_rss_redirect_links(google_rss_links: list[str]):
     return deduped
 
 
-def scrape_articles(urls: list[str], timeout: int = 20):
-    max_workers = min(8, len(urls))
-
-    def get_title(soup):
-        for sel in (
-            "h1.entry-title",
-            "h1.post-title",
-            "h1.article-title",
-            "article h1",
-            "h1",
+def scrape_articles(
+    urls: list[str],
+    timeout: int = 20,
+    article_index=None,
+    max_bytes: int = 2 * 1024 * 1024,
+    max_text_chars: int = 20000,
+    chunk_size: int = 16 * 1024,
+):
+    # Only fetch one copy of URLs that differ by tracking params or AMP variants
+    canonical_urls = {}
+    for u in urls:
+        canonical_urls.setdefault(canonicalize_url(u), u)
+
+    fetch_urls = list(canonical_urls.values())
+    max_workers = max(1, min(8, len(fetch_urls)))
+
+    def has_class(name: str):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    def get_strings(element):
+        # Text of the element and its descendants, without comments
+        return [s.strip() for s in element.itertext() if s.strip()]
+
+    def remove_element(element):
+        # Keep the text that follows the element in its parent
+        parent = element.getparent()
+        if parent is None:
+            return
+
+        if element.tail:
+            previous = element.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or "") + element.tail
+            else:
+                parent.text = (parent.text or "") + element.tail
+
+        parent.remove(element)
+
+    def get_title(root):
+        for path in (
+            f"//h1[{has_class('entry-title')}]",
+            f"//h1[{has_class('post-title')}]",
+            f"//h1[{has_class('article-title')}]",
+            "//article//h1",
+            "//h1",
         ):
-            element = soup.select_one(sel)
-            if element:
-                title = element.get_text(strip=True)
+            elements = root.xpath(path)
+            if elements:
+                title = "".join(get_strings(elements[0]))
                 if title:
                     return title
 
-        meta = soup.select_one('meta[property="og:title"]')
+        meta = root.xpath('//meta[@property="og:title"]/@content')
 
-        if meta and meta.get("content"):
-            return meta["content"].strip()
+        if meta and meta[0].strip():
+            return meta[0].strip()
 
-        return soup.title.get_text(strip=True) if soup.title else ""
+        title = root.xpath("//title")
+        return "".join(get_strings(title[0])) if title else ""
 
-    def get_text(soup):
-        for t in soup.select(
-            "script,style,noscript,figure,figcaption,aside,header,footer,nav"
+    def get_text(root):
+        for t in root.xpath(
+            "//script|//style|//noscript|//figure|//figcaption"
+            "|//aside|//header|//footer|//nav"
         ):
-            t.decompose()
+            remove_element(t)
 
         candidates = []
-        for sel in (
-            "article .entry-content",
-            "article",
-            "div.entry-content",
-            'div[itemprop="articleBody"]',
-            "section.article-body",
-            "div.post-content",
-            "#content",
-            "main",
+        for path in (
+            f"//article//*[{has_class('entry-content')}]",
+            "//article",
+            f"//div[{has_class('entry-content')}]",
+            '//div[@itemprop="articleBody"]',
+            f"//section[{has_class('article-body')}]",
+            f"//div[{has_class('post-content')}]",
+            '//*[@id="content"]',
+            "//main",
         ):
-            c = soup.select_one(sel)
+            c = root.xpath(path)
             if c:
-                candidates.append(c)
+                candidates.append(c[0])
 
         node = (
-            max(candidates, key=lambda n: len(n.find_all("p"))) if candidates else soup
+            max(candidates, key=lambda n: len(n.xpath(".//p"))) if candidates else root
         )
-        paragraphs = [p.get_text(" ", strip=True) for p in node.find_all("p")]
+        paragraphs = [" ".join(get_strings(p)) for p in node.xpath(".//p")]
 
         return "\n\n".join(paragraphs).strip()
 
     headers = {"User-Agent": "Mozilla/5.0 Chrome/124 Safari/537.36"}
 
+    def get_encoding(content_type: str, head: bytes):
+        # An explicit charset, then a <meta> charset near the top of the page,
+        # otherwise UTF-8 (libxml2 would assume Latin-1)
+        for match in (
+            re.search(r"charset=([\w-]+)", content_type),
+            re.search(rb"<meta[^>]+charset=[\"']?([\w-]+)", head[:1024], re.I),
+        ):
+            if not match:
+                continue
+
+            encoding = match.group(1)
+            encoding = encoding.decode() if isinstance(encoding, bytes) else encoding
+            try:
+                return codecs.lookup(encoding).name
+            except LookupError:
+                continue
+
+        return "utf-8"
+
+    def read_body(response, content_type: str):
+        # Stream the body up to max_bytes into the incremental parser, and stop
+        # early once it has seen enough paragraph text (clean_texts keeps
+        # 20000 chars). The tree it builds is the one the text is read from.
+        parser = None
+        body_bytes = 0
+        text_chars = 0
+        truncated = False
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if parser is None:
+                parser = etree.HTMLPullParser(
+                    events=("end",),
+                    tag="p",
+                    encoding=get_encoding(content_type, chunk),
+                )
+
+            chunk = chunk[: max_bytes - body_bytes]
+            body_bytes += len(chunk)
+            parser.feed(chunk)
+
+            for _, element in parser.read_events():
+                text_chars += len("".join(element.itertext()).strip())
+
+            if body_bytes >= max_bytes or text_chars >= max_text_chars:
+                truncated = True
+                break
+
+        if parser is None:
+            raise ValueError("Empty response body")
+
+        return parser.close(), body_bytes, truncated
+
     def fetch_one(url: str):
+        if article_index is not None:
+            # Reuse an earlier scrape of the same canonical article
+            cached = article_index.get_article(url)
+            if cached:
+                return {
+                    "url": url,
+                    "title": cached["title"],
+                    "text": cached["text"],
+                    "group": cached["group"],
+                }
+
         try:
             with requests.Session() as session:
                 session.headers.update(headers)
-                response = session.get(url, timeout=timeout)
-
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, "lxml")
 
-                return {"url": url, "title": get_title(soup), "text": get_text(soup)}
+                with session.get(url, timeout=timeout, stream=True) as response:
+                    response.raise_for_status()
+
+                    # Skip PDFs, images, feeds, etc. before downloading them
+                    content_type = response.headers.get("content-type", "").lower()
+                    if content_type and "html" not in content_type:
+                        raise ValueError(f"Unsupported content type: {content_type}")
+
+                    content_length = response.headers.get("content-length", "")
+                    content_length = (
+                        int(content_length) if content_length.isdigit() else None
+                    )
+
+                    root, body_bytes, truncated = read_body(response, content_type)
+
+                    # Bytes taken off the wire, before any gzip decoding
+                    wire_bytes = response.raw.tell() or body_bytes
+                    if content_length:
+                        # The limit may have been hit on the last chunk
+                        truncated = wire_bytes < content_length
+
+                result = {
+                    "url": url,
+                    "title": get_title(root),
+                    "text": get_text(root),
+                    "bytes_read": wire_bytes,
+                    # Only known with a Content-Length, chunked responses that
+                    # were stopped early are just flagged as truncated
+                    "bytes_saved": max(0, content_length - wire_bytes)
+                    if content_length
+                    else 0,
+                    "truncated": truncated,
+                    # Decoded bytes fed to the parser
+                    "body_bytes": body_bytes,
+                }
         except Exception as e:
             return {"url": url, "title": "", "text": "", "error": str(e)}
 
+        if article_index is not None:
+            result["group"] = article_index.add_article(result)
+
+        return result
+
     results = []
-    order = {u: i for i, u in enumerate(urls)}
+    order = {u: i for i, u in enumerate(fetch_urls)}
 
     with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        future_map = {ex.submit(fetch_one, u): u for u in urls}
+        future_map = {ex.submit(fetch_one, u): u for u in fetch_urls}
 
         for future in as_completed(future_map):
             results.append(future.result())
 
     # Preserve original URL order
     results.sort(key=lambda r: order.get(r["url"], 10**9))
+
+    # Flag syndicated copies of an article that already appeared in this batch
+    seen_groups = set()
+    for r in results:
+        group = r.get("group")
+        r["duplicate"] = group is not None and group in seen_groups
+        if group is not None:
+            seen_groups.add(group)
+
     return results
 
 
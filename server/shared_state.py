@@ -0,0 +1,266 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from congress_members import Congressperson
+
+try:
+    import fcntl
+except ImportError:  # Windows, fall back to no cross-process locking
+    fcntl = None
+
+
+def get_shared_state_dir():
+    path = os.getenv(
+        "SHARED_STATE_DIR", os.path.join(tempfile.gettempdir(), "politicalpulse")
+    )
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+
+@contextmanager
+def file_lock(path: str):
+    # Exclusive lock shared by every worker process on the host
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_roster_snapshot(path: str, max_age: float):
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+
+        # Each worker parses its own copy, the snapshot only saves the fetch
+        with open(path, "rb") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    house_rep_members = [Congressperson(**m) for m in data["house_rep_members"]]
+    senate_members = [Congressperson(**m) for m in data["senate_members"]]
+
+    return house_rep_members, senate_members
+
+
+def load_shared_roster(fetch_members, max_age: float = 6 * 3600):
+    # Loads the roster from the host snapshot, and only the first worker to
+    # take the lock calls fetch_members when the snapshot is missing or stale
+    state_dir = get_shared_state_dir()
+    snapshot_path = os.path.join(state_dir, "roster.json")
+
+    roster = read_roster_snapshot(snapshot_path, max_age)
+    if roster:
+        return roster
+
+    with file_lock(os.path.join(state_dir, "roster.lock")):
+        # Another worker may have refreshed the snapshot while we waited
+        roster = read_roster_snapshot(snapshot_path, max_age)
+        if roster:
+            return roster
+
+        house_rep_members, senate_members = fetch_members()
+
+        data = {
+            "house_rep_members": [m.model_dump() for m in house_rep_members],
+            "senate_members": [m.model_dump() for m in senate_members],
+        }
+
+        # Write then rename so readers never see a partial snapshot
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, snapshot_path)
+
+        return house_rep_members, senate_members
+
+
+def read_shared_payload(path: str):
+    try:
+        with open(path, "rb") as f:
+            etag, _, payload = f.read().partition(b"\n")
+    except OSError:
+        return None
+
+    return payload, etag.decode()
+
+
+def load_shared_payload(path: str, build_payload):
+    # Returns (payload, etag) from the host file, and only the first worker
+    # to take the lock calls build_payload when the file is missing. Workers
+    # read the file for every request instead of keeping their own copy.
+    cached = read_shared_payload(path)
+    if cached:
+        return cached
+
+    with file_lock(os.path.join(os.path.dirname(path), "payloads.lock")):
+        # Another worker may have written the payload while we waited
+        cached = read_shared_payload(path)
+        if cached:
+            return cached
+
+        payload, etag = build_payload()
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(etag.encode() + b"\n" + payload)
+        os.replace(tmp_path, path)
+
+        return payload, etag
+
+
+class SharedCache:
+    # On-disk cache shared by every worker on the host. WAL mode lets workers
+    # read concurrently while one of them writes.
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS redirects (
+                url TEXT PRIMARY KEY,
+                link TEXT NOT NULL,
+                created_at REAL NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS idx_articles_title ON articles (title);
+
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.conn.commit()
+
+    def get_report(self, key: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM reports WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def set_report(self, key: str, value: str, max_age: float):
+        # Each report keeps the lifetime of whatever generated it, e.g. the
+        # bulk refresh keeps its reports longer than on-demand requests
+        now = time.time()
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO reports (key, value, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, value, now, now + max_age),
+            )
+
+    def get_redirects(self, urls: list[str]) -> dict[str, str]:
+        if not urls:
+            return {}
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT url, link FROM redirects WHERE url IN ({','.join('?' * len(urls))})",
+                urls,
+            ).fetchall()
+
+        return dict(rows)
+
+    def set_redirects(self, redirects: dict[str, str]):
+        now = time.time()
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO redirects (url, link, created_at) VALUES (?, ?, ?)",
+                [(url, link, now) for url, link in redirects.items()],
+            )
+
+    def get_article(self, canonical_url: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM articles WHERE url = ?", (canonical_url,)
+            ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def get_article_by_title(self, title: str):
+        # The first article scraped under a normalized title
+        with self.lock:
+            row = self.conn.execute(
+                """
+                SELECT value FROM articles
+                WHERE title = ?
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (title,),
+            ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def set_article(self, canonical_url: str, title: str, article: dict):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR IGNORE INTO articles (url, title, value, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (canonical_url, title, json.dumps(article), time.time()),
+            )
+
+    def get_embedding(self, model: str, digest: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND digest = ?",
+                (model, digest),
+            ).fetchone()
+
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def set_embedding(self, model: str, digest: str, vector):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                (model, digest, np.asarray(vector, dtype=np.float32).tobytes()),
+            )
+
+
+def get_shared_cache(db_path: str | None = None) -> SharedCache:
+    if db_path is None:
+        db_path = os.path.join(get_shared_state_dir(), "shared_cache.db")
+
+    return SharedCache(db_path)
@@ -0,0 +1,183 @@
+# python -m pytest test_bulk_refresh.py
+# Runs the bulk refresh end to end against batch_stand_in.py
+
+import json
+import shutil
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import uvicorn
+from openai import OpenAI
+from batch_stand_in import app as stand_in_app, fake_embedding
+from congress_members import Congressperson
+
+
+@pytest.fixture(scope="session")
+def modules(tmp_path_factory):
+    # main creates its clients and stores at import, so point them at a
+    # scratch directory and a placeholder key first
+    state_dir = tmp_path_factory.mktemp("shared_state")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SHARED_STATE_DIR", str(state_dir))
+        mp.setenv("HISTORY_DB_PATH", str(state_dir / "history.db"))
+        mp.setenv("OPENAI_API_KEY", "test")
+
+        import bulk_refresh
+        import embeddings
+        import main
+
+        yield SimpleNamespace(
+            main=main, bulk_refresh=bulk_refresh, embeddings=embeddings
+        )
+
+    main.history_store.close()
+    main.shared_cache.conn.close()
+    shutil.rmtree(state_dir)
+
+
+WORDS = "budget farm rural broadband tariff veterans health housing energy water"
+
+
+@pytest.fixture(scope="module")
+def stand_in_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(stand_in_app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.05)
+
+    yield f"http://127.0.0.1:{port}/v1"
+
+    server.should_exit = True
+    thread.join()
+
+
+def get_member_articles(name: str, limit: int = 25):
+    if name == "Senator Quiet Member":
+        # Nothing usable, so the member must be skipped before any request
+        article_data = [{"url": "https://example.com/empty", "title": "", "text": ""}]
+        return [item["url"] for item in article_data], article_data
+
+    # t-SNE uses a perplexity of 10, so every member needs more than 10 texts
+    article_data = []
+    for i in range(12):
+        words = WORDS.split()
+        text = " ".join(
+            f"{words[(i + j) % len(words)]} {name} story{i} line{j}" for j in range(40)
+        )
+        article_data.append(
+            {
+                "url": f"https://example.com/{name.split()[-1].lower()}/{i}",
+                "title": f"{name} story {i}",
+                "text": text,
+            }
+        )
+
+    return [item["url"] for item in article_data], article_data
+
+
+def test_run_bulk_refresh(modules, stand_in_url, monkeypatch):
+    main, bulk_refresh = modules.main, modules.bulk_refresh
+
+    monkeypatch.setattr(main, "get_member_articles", get_member_articles)
+    main.app.state.house_rep_members = [
+        Congressperson(name="Ada Lovelace", partyName="Democratic", state="Ohio")
+    ]
+    main.app.state.senate_members = [
+        Congressperson(name="Quiet Member", partyName="Republican", state="Utah")
+    ]
+
+    openai_client = OpenAI(base_url=stand_in_url, api_key="test")
+    names = ["Rep. Ada Lovelace", "Senator Quiet Member"]
+
+    reports_loaded, embeddings_loaded = bulk_refresh.run_bulk_refresh(
+        openai_client, names, limit=25, poll_seconds=0
+    )
+
+    assert reports_loaded == 1
+    assert embeddings_loaded == 12
+
+    report = json.loads(main.shared_cache.get_report("Rep. Ada Lovelace|25"))
+    assert report["summary"] == "**Stand-in** summary."
+    assert len(report["article_links"]) == 12
+    assert len(report["article_tsne_xs"]) == 12
+    assert main.shared_cache.get_report("Senator Quiet Member|25") is None
+
+    series = main.history_store.get_member_series("Ada Lovelace")
+    assert len(series) == 1
+    assert series[0].pulseSentiment == report["pulseSentiment"]
+    assert series[0].article_count == 12
+    assert main.history_store.get_member_series("Quiet Member") == []
+
+    # Checking the cache while writing the batch does not count as lookups,
+    # only building the report does, and every vector came from the batch
+    assert main.article_index.get_stats().get("embedding_lookups", 0) == 12
+    assert main.article_index.get_stats().get("embedding_hits", 0) == 12
+
+    # The stand-in returns batch embeddings out of order
+    _, article_data = get_member_articles("Rep. Ada Lovelace")
+    texts, _ = modules.embeddings.clean_texts(
+        [item["text"] for item in article_data], "Rep. Ada Lovelace"
+    )
+    for text in texts:
+        vector, _ = main.article_index.find_embedding(
+            text, modules.embeddings.EMBEDDING_MODEL
+        )
+        assert np.allclose(vector, fake_embedding(text), atol=1e-6)
+
+
+def test_failed_embedding_batch_falls_back(modules, stand_in_url, monkeypatch):
+    main, bulk_refresh, embeddings = modules.main, modules.bulk_refresh, modules.embeddings
+    openai_client = OpenAI(base_url=stand_in_url, api_key="test")
+
+    monkeypatch.setattr(main, "get_member_articles", get_member_articles)
+    monkeypatch.setattr(embeddings, "client", openai_client)
+
+    wait_for_batch = bulk_refresh.wait_for_batch
+
+    def fail_embedding_batch(openai_client, batch_id, poll_seconds=30):
+        if openai_client.batches.retrieve(batch_id).endpoint == "/v1/embeddings":
+            raise RuntimeError(f"Batch {batch_id} ended with status failed")
+
+        return wait_for_batch(openai_client, batch_id, poll_seconds)
+
+    monkeypatch.setattr(bulk_refresh, "wait_for_batch", fail_embedding_batch)
+
+    # The reports still load, with the embeddings made synchronously
+    assert bulk_refresh.run_bulk_refresh(
+        openai_client, ["Rep. Grace Hopper"], limit=10, poll_seconds=0
+    ) == (1, 0)
+    assert main.shared_cache.get_report("Rep. Grace Hopper|10") is not None
+
+
+def test_write_batch_files_splits_at_limits(modules, monkeypatch, tmp_path):
+    bulk_refresh = modules.bulk_refresh
+
+    monkeypatch.setattr(bulk_refresh, "MAX_BATCH_REQUESTS", 2)
+
+    requests = [
+        {"custom_id": str(i), "method": "POST", "url": "/v1/responses", "body": {}}
+        for i in range(5)
+    ]
+    paths = bulk_refresh.write_batch_files(requests, str(tmp_path), "reports")
+
+    assert [len(open(path).readlines()) for path in paths] == [2, 2, 1]
+
+    line_bytes = len(json.dumps(requests[0]) + "\n")
+    monkeypatch.setattr(bulk_refresh, "MAX_BATCH_REQUESTS", 50000)
+    monkeypatch.setattr(bulk_refresh, "MAX_BATCH_BYTES", line_bytes * 3)
+    paths = bulk_refresh.write_batch_files(requests, str(tmp_path), "more")
+
+    assert [len(open(path).readlines()) for path in paths] == [3, 2]